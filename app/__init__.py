@@ -38,6 +38,7 @@ def create_app():
     from app.ai_routes import ai_bp
     from app.feedback_routes import feedback_bp
     from app.export_routes import export_bp
+    from app.job_routes import jobs_bp
     from app.ui_routes import ui_bp
     app.register_blueprint(ui_bp)
     app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -45,7 +46,27 @@ def create_app():
     app.register_blueprint(ai_bp, url_prefix="/api")
     app.register_blueprint(feedback_bp, url_prefix="/api")
     app.register_blueprint(export_bp, url_prefix="/api")
-    with app.app_context():
-        db.create_all()
+    app.register_blueprint(jobs_bp, url_prefix="/api")
+
+    from app import metrics
+    metrics.init_app(app)
+    from app.doc_templates import load_templates
+    load_templates(app)
 
     return app
+
+
+def start_services(app):
+    """Start the job threads and render pool of a process that serves requests.
+
+    Called from gunicorn's post_worker_init hook and by the dev server, not
+    by create_app: one-shot commands (upgrade-db, compact-revisions) and
+    render pool workers, which re-import run.py, must not start them.
+    """
+    if app.config["JOB_EXECUTION_MODE"] == "thread":
+        from app.job_service import start_background_workers
+        start_background_workers(app)
+
+    if app.config["EXPORT_EXECUTION_MODE"] == "process" and app.config["RENDER_POOL_PREWARM"]:
+        from app.render_pool import prewarm_pool
+        prewarm_pool(app)
@@ -0,0 +1,124 @@
+"""Ownership checks shared by the blueprints.
+
+Each helper resolves the row and checks that it belongs to the user in a
+single query, and returns ``(row, error)`` where ``error`` is a ready
+``(response, status)`` tuple or None.
+
+Confirmed (user, project) pairs are also kept, with the project title, in
+a short-lived per-process cache (ACCESS_CACHE_TTL_SECONDS), so read
+endpoints that don't need the project row skip the lookup entirely.
+Entries are dropped when a project row is updated or deleted through the
+ORM; other processes' copies simply expire.
+"""
+import threading
+import time
+
+from flask import current_app, jsonify
+from sqlalchemy import and_, event
+
+from app import db
+from app.models import Project, ProjectSection
+
+
+class _OwnershipCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (user_id, project_id) -> (expires_at, title)
+
+    def get(self, user_id, project_id):
+        """The cached project title, or None."""
+        with self._lock:
+            entry = self._entries.get((user_id, project_id))
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[(user_id, project_id)]
+                return None
+            return entry[1]
+
+    def remember(self, user_id, project_id, title, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) > 10000:
+                self._entries.clear()
+            self._entries[(user_id, project_id)] = (time.monotonic() + ttl, title)
+
+    def forget_project(self, project_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == project_id]:
+                del self._entries[key]
+
+
+_cache = _OwnershipCache()
+
+
+@event.listens_for(Project, "after_update")
+@event.listens_for(Project, "after_delete")
+def _invalidate(mapper, connection, project):
+    _cache.forget_project(project.id)
+
+
+def _remember(user_id, project):
+    _cache.remember(
+        user_id, project.id, project.title, current_app.config["ACCESS_CACHE_TTL_SECONDS"]
+    )
+
+
+def owned_project(project_id, user_id):
+    """Load a project the user owns; 404 otherwise."""
+    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
+    if not project:
+        return None, (jsonify({"message": "Project not found"}), 404)
+    _remember(user_id, project)
+    return project, None
+
+
+def owned_project_title(project_id, user_id):
+    """Like owned_project, for callers that only need the title.
+
+    Returns ``(title, error)``; served from the ownership cache when possible.
+    """
+    title = _cache.get(user_id, project_id)
+    if title is not None:
+        return title, None
+    row = (
+        db.session.query(Project.id, Project.title)
+        .filter(Project.id == project_id, Project.user_id == user_id)
+        .first()
+    )
+    if not row:
+        return None, (jsonify({"message": "Project not found"}), 404)
+    _remember(user_id, row)
+    return row.title, None
+
+
+def owned_section(section_id, user_id, with_project=False):
+    """Load a section and check its project belongs to the user, in one query.
+
+    The project is outer-joined on (id, owner): no row means the section
+    doesn't exist (404), a row without a project means someone else owns
+    it (403). Returns ``(section, error)``, or ``(section, project, error)``
+    with ``with_project=True``.
+    """
+    row = (
+        db.session.query(ProjectSection, Project)
+        .outerjoin(Project, and_(
+            Project.id == ProjectSection.project_id,
+            Project.user_id == user_id,
+        ))
+        .filter(ProjectSection.id == section_id)
+        .first()
+    )
+    section, project, error = None, None, None
+    if row is None:
+        error = (jsonify({"message": "Section not found"}), 404)
+    elif row[1] is None:
+        error = (jsonify({"message": "Not authorized for this section"}), 403)
+    else:
+        section, project = row
+        _remember(user_id, project)
+
+    if with_project:
+        return section, project, error
+    return section, error
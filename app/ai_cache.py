@@ -0,0 +1,197 @@
+"""Content-addressed cache for Gemini prompt/response pairs.
+
+Lookups go through a per-process LRU first and then the shared
+``ai_response_cache`` table. Entries expire after AI_CACHE_TTL_SECONDS and
+the table is trimmed to AI_CACHE_DB_MAX_ROWS, oldest first. Trimming runs
+every AI_CACHE_EVICT_EVERY writes per process, so the table can run that
+far over the limit per worker in between. Counters are exported at
+/metrics.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.config import Config
+from app.models import AIResponseCache
+
+
+def _config(name):
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "memory_evictions": 0,
+            "db_evictions": 0,
+            "expired": 0,
+        }
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class _LRU:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (stored_at, value)
+
+    def get(self, key, ttl):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > ttl:
+                del self._data[key]
+                stats.incr("expired")
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, max_entries):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            stats.incr("memory_evictions", evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+stats = _Stats()
+_memory = _LRU()
+_puts = 0
+_puts_lock = threading.Lock()
+
+
+def cache_key(backend, model, prompt, params=None):
+    """Hash of everything that determines the model's answer.
+
+    ``backend`` is the LLM backend name, so text from the offline fake
+    backend (load tests, benchmarks) is never served to Gemini users.
+    """
+    raw = json.dumps(
+        {"backend": backend, "model": model, "prompt": prompt, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    if not _config("AI_CACHE_ENABLED"):
+        return None
+
+    ttl = _config("AI_CACHE_TTL_SECONDS")
+    value = _memory.get(key, ttl)
+    if value is not None:
+        stats.incr("memory_hits")
+        return value
+
+    if has_app_context():
+        # Separate session so cache traffic never touches the caller's transaction
+        with Session(db.engine) as session:
+            row = session.query(AIResponseCache).filter_by(key=key).first()
+            if row is not None:
+                if row.created_at < datetime.utcnow() - timedelta(seconds=ttl):
+                    session.delete(row)
+                    session.commit()
+                    stats.incr("expired")
+                else:
+                    stats.incr("db_hits")
+                    _memory.set(key, row.response, _config("AI_CACHE_MEMORY_ENTRIES"))
+                    return row.response
+
+    stats.incr("misses")
+    return None
+
+
+def put(key, model, response):
+    if not _config("AI_CACHE_ENABLED"):
+        return
+
+    _memory.set(key, response, _config("AI_CACHE_MEMORY_ENTRIES"))
+    if not has_app_context():
+        return
+
+    with Session(db.engine) as session:
+        session.add(AIResponseCache(key=key, model=model, response=response))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another worker stored the same prompt first
+            session.rollback()
+            return
+        if _due_for_eviction():
+            _evict(session)
+
+
+def _due_for_eviction():
+    global _puts
+    with _puts_lock:
+        _puts += 1
+        return _puts % max(1, _config("AI_CACHE_EVICT_EVERY")) == 0
+
+
+def _evict(session):
+    ttl = _config("AI_CACHE_TTL_SECONDS")
+    expired = (
+        session.query(AIResponseCache)
+        .filter(AIResponseCache.created_at < datetime.utcnow() - timedelta(seconds=ttl))
+        .delete(synchronize_session=False)
+    )
+
+    max_rows = _config("AI_CACHE_DB_MAX_ROWS")
+    excess = session.query(AIResponseCache).count() - max_rows
+    evicted = 0
+    if excess > 0:
+        oldest = (
+            session.query(AIResponseCache.id)
+            .order_by(AIResponseCache.created_at, AIResponseCache.id)
+            .limit(excess)
+        )
+        evicted = (
+            session.query(AIResponseCache)
+            .filter(AIResponseCache.id.in_([r.id for r in oldest]))
+            .delete(synchronize_session=False)
+        )
+    session.commit()
+
+    if expired:
+        stats.incr("expired", expired)
+    if evicted:
+        stats.incr("db_evictions", evicted)
+
+
+def memory_entries():
+    return len(_memory)
@@ -1,24 +1,91 @@
-from flask import Blueprint, jsonify, request
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from app import db
-from app.models import Project, ProjectSection, SectionRevision
-# Import AI service functions at runtime inside handlers to avoid import-time
-# failures when optional AI libs are missing or misconfigured.
+from app.access import owned_project, owned_section
+from app.ai_service import (
+    refine_section_content,
+    stream_refined_section_content,
+    stream_section_content,
+)
+from app.models import Project, ProjectSection
+from app.job_service import active_job_for_project, create_generation_job, snapshot
+from app.idempotency import idempotent
+from app.llm_limits import LLMThrottled
+from app.revision_service import record_revision
+from app.singleflight import SingleFlight
 
 ai_bp = Blueprint("ai", __name__)
 
+# Identical generate/refine requests arriving together (double clicks,
+# impatient retries) share one run
+_generate_flight = SingleFlight("generate")
+_refine_flight = SingleFlight("refine")
+
+
+_REMOVED = "This section was removed from the outline."
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_worker(app, stream_fn, args, use_cache, section_id, out):
+    """Push one section's chunks onto ``out``, ending with a done/error marker."""
+    with app.app_context():
+        try:
+            for chunk in stream_fn(*args, use_cache=use_cache):
+                out.put((section_id, "chunk", chunk))
+        except Exception as e:
+            # Details stay in the log; the browser gets a generic message
+            print("AI stream error for section", section_id, ":", e)
+            out.put((section_id, "error", (
+                "The AI service is busy; please try again shortly."
+                if isinstance(e, LLMThrottled)
+                else "AI generation failed; please try again."
+            )))
+        else:
+            out.put((section_id, "done", None))
+
+
+def _release_connection():
+    """Return the request's DB connection to the pool before a model call.
+
+    Nothing is pending at this point, so committing only ends the read
+    transaction; loaded rows stay usable. Otherwise every request waiting
+    on the model would hold a pooled connection, which caps concurrency
+    at the pool size under gevent workers.
+    """
+    session = db.session()
+    expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+
 
 @ai_bp.route("/projects/<int:project_id>/generate", methods=["POST"])
 @jwt_required()
+@idempotent
 def generate_project_content(project_id):
-    """Generate content for all sections of a project."""
+    """Queue a background job generating content for all sections of a project."""
     user_id = int(get_jwt_identity())
 
-    # Ensure this project belongs to the logged-in user
-    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Project not found"}), 404
+    project, error = owned_project(project_id, user_id)
+    if error:
+        return error
 
     sections = (
         ProjectSection.query
@@ -29,50 +96,28 @@ def generate_project_content(project_id):
     if not sections:
         return jsonify({"message": "No sections configured"}), 400
 
-    for sec in sections:
-        old_text = sec.current_content
-
-        try:
-            try:
-                from app.ai_service import generate_section_content
-            except Exception as e:
-                print("AI service import failed:", e)
-                new_text = old_text or "(AI generation unavailable)"
-            else:
-                new_text = generate_section_content(project, sec)
-        except Exception as e:
-            # Do NOT crash the whole request – log and fallback
-            print("AI generation error for section", sec.id, ":", e)
-            new_text = old_text or "(AI generation failed; please try again.)"
-
-        sec.current_content = new_text
-
-        # Determine next version number
-        last_rev = (
-            SectionRevision.query
-            .filter_by(section_id=sec.id)
-            .order_by(SectionRevision.version.desc())
-            .first()
-        )
-        next_version = (last_rev.version + 1) if last_rev else 1
-
-        rev = SectionRevision(
-            section_id=sec.id,
-            version=next_version,
-            prompt="initial generation" if not last_rev else "regenerate",
-            old_content=old_text,
-            new_content=new_text,
-        )
-        db.session.add(rev)
+    data = request.get_json(silent=True) or {}
+    use_cache = data.get("use_cache", True) is not False
+    # "batch" asks for the whole outline in one structured call
+    mode = data.get("mode") or "section"
+    if mode not in ("section", "batch"):
+        return jsonify({"message": "mode must be 'section' or 'batch'"}), 400
 
-    project.status = "generated"
-    db.session.commit()
+    # Generation runs on the job workers; hand back a job id to poll.
+    # A second click while a job is still pending just returns that job.
+    def start_job():
+        job = active_job_for_project(project.id)
+        if not job:
+            job = create_generation_job(project, sections, use_cache=use_cache, mode=mode)
+        return {"job_id": job.id, "status": job.status}
 
-    return jsonify({"message": "Content generated successfully"}), 200
+    job = _generate_flight.do(project.id, start_job)
+    return jsonify({"message": "Content generation started", **job}), 202
 
 
 @ai_bp.route("/sections/<int:section_id>/refine", methods=["POST"])
 @jwt_required()
+@idempotent
 def refine_section(section_id):
     """Refine a single section based on a user prompt."""
     user_id = int(get_jwt_identity())
@@ -82,50 +127,199 @@ def refine_section(section_id):
     if not user_prompt:
         return jsonify({"message": "prompt is required"}), 400
 
-    section = ProjectSection.query.get(section_id)
-    if not section:
-        return jsonify({"message": "Section not found"}), 404
+    section, project, error = owned_section(section_id, user_id, with_project=True)
+    if error:
+        return error
+    _release_connection()
 
-    project = Project.query.filter_by(id=section.project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Not authorized for this section"}), 403
-
-    # Latest version for this section
-    last_rev = (
-        SectionRevision.query
-        .filter_by(section_id=section.id)
-        .order_by(SectionRevision.version.desc())
-        .first()
+    use_cache = data.get("use_cache", True) is not False
+    body, status, headers = _refine_flight.do(
+        (section.id, user_prompt, use_cache),
+        lambda: _refine(project, section, user_prompt, use_cache),
     )
-    next_version = (last_rev.version + 1) if last_rev else 1
+    return jsonify(body), status, headers
 
-    old_text = section.current_content or ""
 
+def _refine(project, section, user_prompt, use_cache):
+    """Refine and save a revision; returns (body, status, headers)."""
     try:
-        try:
-            from app.ai_service import refine_section_content
-        except Exception as e:
-            print("AI service import failed:", e)
-            return jsonify({"message": "AI refine unavailable; optional dependency missing or misconfigured."}), 500
-        new_text = refine_section_content(project, section, user_prompt)
+        new_text = refine_section_content(project, section, user_prompt, use_cache=use_cache)
+    except LLMThrottled as e:
+        print("AI refine throttled for section", section.id, ":", e)
+        retry_after = max(1, round(e.retry_after or 5))
+        return (
+            {"message": "The AI service is busy; please try again shortly."},
+            503,
+            {"Retry-After": str(retry_after)},
+        )
     except Exception as e:
         print("AI refine error for section", section.id, ":", e)
-        return jsonify({"message": "AI refine failed; please try again."}), 500
+        return {"message": "AI refine failed; please try again."}, 500, {}
 
-    section.current_content = new_text
-
-    rev = SectionRevision(
-        section_id=section.id,
-        version=next_version,
-        prompt=user_prompt,
-        old_content=old_text,
-        new_content=new_text,
-    )
-    db.session.add(rev)
+    next_version = record_revision(section, new_text, user_prompt)
     db.session.commit()
+    if next_version is None:
+        return {"message": "Section not found"}, 404, {}
 
-    return jsonify({
+    return {
         "section_id": section.id,
         "version": next_version,
         "content": new_text,
-    }), 200
+    }, 200, {}
+
+
+@ai_bp.route("/projects/<int:project_id>/generate/stream", methods=["POST"])
+@jwt_required()
+def stream_project_content(project_id):
+    """Generate all sections, streaming chunks as Server-Sent Events.
+
+    Each section is saved (content + revision) once its own stream completes.
+    """
+    user_id = int(get_jwt_identity())
+
+    project, error = owned_project(project_id, user_id)
+    if error:
+        return error
+
+    sections = (
+        ProjectSection.query
+        .filter_by(project_id=project.id)
+        .order_by(ProjectSection.index)
+        .all()
+    )
+    if not sections:
+        return jsonify({"message": "No sections configured"}), 400
+
+    # A background job is already writing these sections; streaming now
+    # would interleave two generations' revisions
+    job = active_job_for_project(project.id)
+    if job:
+        return jsonify({
+            "message": "Content generation is already running",
+            "job_id": job.id,
+            "status": job.status,
+        }), 409
+
+    data = request.get_json(silent=True) or {}
+    use_cache = data.get("use_cache", True) is not False
+
+    app = current_app._get_current_object()
+    project_data = snapshot(project, "id", "title", "doc_type", "main_topic")
+    section_data = [
+        snapshot(sec, "id", "index", "title", "current_content") for sec in sections
+    ]
+
+    section_ids = [sec.id for sec in sections]
+    _release_connection()
+
+    def events():
+        # The model calls run outside the request's original transaction,
+        # so each result is written through a freshly loaded row.
+        out = queue.Queue()
+        buffers = {sid: [] for sid in section_ids}
+        workers = max(1, min(app.config["AI_GENERATION_CONCURRENCY"], len(sections)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for sec in section_data:
+                pool.submit(
+                    _stream_worker, app, stream_section_content,
+                    (project_data, sec), use_cache, sec.id, out,
+                )
+
+            remaining = len(sections)
+            while remaining:
+                section_id, kind, text = out.get()
+                if kind == "chunk":
+                    buffers[section_id].append(text)
+                    yield _sse("chunk", {"section_id": section_id, "text": text})
+                    continue
+
+                remaining -= 1
+                sec = db.session.get(ProjectSection, section_id)
+                if sec is None:
+                    # Removed from the outline while it was being generated
+                    yield _sse("section_error", {"section_id": section_id, "error": _REMOVED})
+                    continue
+                if kind == "error":
+                    new_text = sec.current_content or "(AI generation failed; please try again.)"
+                    yield _sse("section_error", {"section_id": section_id, "error": text})
+                else:
+                    new_text = "".join(buffers[section_id]).strip()
+
+                version = record_revision(sec, new_text)
+                db.session.commit()
+                if version is None:
+                    yield _sse("section_error", {"section_id": section_id, "error": _REMOVED})
+                    continue
+                yield _sse("section_done", {
+                    "section_id": section_id,
+                    "version": version,
+                    "content": new_text,
+                })
+
+            Project.query.filter_by(id=project_id).update(
+                {Project.status: "generated"}, synchronize_session=False
+            )
+            db.session.commit()
+            yield _sse("done", {"project_id": project_id})
+        finally:
+            # Client went away: stop feeding sections that have not started
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    return _sse_response(events())
+
+
+@ai_bp.route("/sections/<int:section_id>/refine/stream", methods=["POST"])
+@jwt_required()
+def stream_refine_section(section_id):
+    """Refine a single section, streaming chunks as Server-Sent Events."""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    user_prompt = data.get("prompt")
+
+    if not user_prompt:
+        return jsonify({"message": "prompt is required"}), 400
+
+    section, project, error = owned_section(section_id, user_id, with_project=True)
+    if error:
+        return error
+    _release_connection()
+
+    use_cache = data.get("use_cache", True) is not False
+
+    def events():
+        parts = []
+        try:
+            chunks = stream_refined_section_content(
+                project, section, user_prompt, use_cache=use_cache
+            )
+            for chunk in chunks:
+                parts.append(chunk)
+                yield _sse("chunk", {"section_id": section_id, "text": chunk})
+        except Exception as e:
+            print("AI refine error for section", section_id, ":", e)
+            busy = isinstance(e, LLMThrottled)
+            yield _sse("section_error", {
+                "section_id": section_id,
+                "error": (
+                    "The AI service is busy; please try again shortly." if busy
+                    else "AI refine failed; please try again."
+                ),
+            })
+            return
+
+        # Reload: the model call ran outside the original transaction
+        new_text = "".join(parts).strip()
+        sec = db.session.get(ProjectSection, section_id)
+        version = record_revision(sec, new_text, user_prompt) if sec is not None else None
+        db.session.commit()
+        if version is None:
+            yield _sse("section_error", {"section_id": section_id, "error": _REMOVED})
+            return
+        yield _sse("section_done", {
+            "section_id": section_id,
+            "version": version,
+            "content": new_text,
+        })
+
+    return _sse_response(events())
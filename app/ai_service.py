@@ -1,17 +1,21 @@
-import os
-from google import genai
+import json
 
-from app.models import ProjectSection, Project  # only if you need types, optional
+from app import ai_cache, llm_limits
+from app.llm_backends import get_backend
+from app.metrics import track_ai
 
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise RuntimeError("GOOGLE_API_KEY is not set")
+MODEL = "gemini-2.5-flash"
+# Anything passed to the model besides the prompt; part of the cache key
+GENERATION_PARAMS = {}
+BATCH_GENERATION_PARAMS = {"response_mime_type": "application/json"}
 
-client = genai.Client(api_key=api_key)
 
+def _doc_kind(project):
+    return "Word report" if project.doc_type == "docx" else "PowerPoint slide (bullet points)"
 
-def generate_section_content(project, section):
-    doc_kind = "Word report" if project.doc_type == "docx" else "PowerPoint slide (bullet points)"
+
+def build_generation_prompt(project, section):
+    doc_kind = _doc_kind(project)
 
     prompt = f"""
 You are helping to write a professional business {doc_kind}.
@@ -21,15 +25,11 @@ Section/Slide title: {section.title}
 
 Write clear, concise content suitable for this {doc_kind}.
 """
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt.strip()
-    )
-    return resp.text.strip()
+    return prompt.strip()
 
 
-def refine_section_content(project, section, user_prompt: str):
-    doc_kind = "Word report" if project.doc_type == "docx" else "PowerPoint slide (bullet points)"
+def build_refine_prompt(project, section, user_prompt: str):
+    doc_kind = _doc_kind(project)
 
     prompt = f"""
 You are refining a specific section of a business {doc_kind}.
@@ -45,8 +45,140 @@ User refinement request:
 
 Return ONLY the revised content.
 """
-    resp = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt.strip()
+    return prompt.strip()
+
+
+def _generate(prompt, use_cache=True, params=None, cacheable=None):
+    """Call the model through the response cache.
+
+    ``cacheable(text)`` can veto storing a response (e.g. malformed JSON).
+    """
+    params = GENERATION_PARAMS if params is None else params
+    key = ai_cache.cache_key(get_backend().name, MODEL, prompt, params)
+    if use_cache:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            return cached
+    else:
+        ai_cache.stats.incr("bypassed")
+
+    def attempt():
+        with track_ai("generate"):
+            return get_backend().generate(MODEL, prompt, params)
+
+    text = llm_limits.call("generate", attempt).strip()
+    if use_cache and (cacheable is None or cacheable(text)):
+        ai_cache.put(key, MODEL, text)
+    return text
+
+
+def build_batch_prompt(project, sections):
+    doc_kind = _doc_kind(project)
+    outline = "\n".join(f"{s.index}. {s.title}" for s in sections)
+
+    prompt = f"""
+You are helping to write a professional business {doc_kind}.
+
+Main topic: {project.main_topic}
+
+Write clear, concise content suitable for this {doc_kind} for EVERY
+section/slide in the outline below.
+
+Outline (index. title):
+{outline}
+
+Respond with a JSON array containing one object per section, in outline
+order, of the form {{"index": <section index>, "content": "<section content>"}}.
+"""
+    return prompt.strip()
+
+
+def parse_batch_response(text, sections):
+    """Map a batched JSON answer onto section indexes.
+
+    Returns {index: content} for the sections that were answered properly;
+    anything malformed, missing or ambiguous is left out.
+    """
+    try:
+        items = json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(items, dict):
+        items = items.get("sections")
+    if not isinstance(items, list):
+        return {}
+
+    wanted = {s.index for s in sections}
+    result = {}
+    duplicates = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        idx, content = item.get("index"), item.get("content")
+        if not isinstance(idx, int) or idx not in wanted:
+            continue
+        if not isinstance(content, str) or not content.strip():
+            continue
+        if idx in result:
+            duplicates.add(idx)
+        result[idx] = content.strip()
+
+    for idx in duplicates:
+        del result[idx]
+    return result
+
+
+def _stream(prompt, use_cache=True):
+    key = ai_cache.cache_key(get_backend().name, MODEL, prompt, GENERATION_PARAMS)
+    if use_cache:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    else:
+        ai_cache.stats.incr("bypassed")
+
+    def attempt():
+        with track_ai("stream"):
+            yield from get_backend().stream(MODEL, prompt, GENERATION_PARAMS)
+
+    parts = []
+    for chunk in llm_limits.stream("stream", attempt):
+        parts.append(chunk)
+        yield chunk
+
+    if use_cache:
+        ai_cache.put(key, MODEL, "".join(parts).strip())
+
+
+def generate_section_content(project, section, use_cache=True):
+    return _generate(build_generation_prompt(project, section), use_cache)
+
+
+def refine_section_content(project, section, user_prompt: str, use_cache=True):
+    return _generate(build_refine_prompt(project, section, user_prompt), use_cache)
+
+
+def stream_section_content(project, section, use_cache=True):
+    """Yield generated text chunks as the model produces them."""
+    return _stream(build_generation_prompt(project, section), use_cache)
+
+
+def stream_refined_section_content(project, section, user_prompt: str, use_cache=True):
+    """Yield refined text chunks as the model produces them."""
+    return _stream(build_refine_prompt(project, section, user_prompt), use_cache)
+
+
+def generate_outline_content(project, sections, use_cache=True):
+    """Generate every section of a project in one structured-JSON call.
+
+    Returns {section index: content}; sections missing from the answer are
+    absent and should be generated one by one by the caller.
+    """
+    text = _generate(
+        build_batch_prompt(project, sections),
+        use_cache,
+        params=BATCH_GENERATION_PARAMS,
+        cacheable=lambda t: len(parse_batch_response(t, sections)) == len(sections),
     )
-    return resp.text.strip()
+    return parse_batch_response(text, sections)
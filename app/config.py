@@ -5,3 +5,105 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///dev.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")
+
+    # Max number of sections generated in parallel per project
+    AI_GENERATION_CONCURRENCY = int(os.getenv("AI_GENERATION_CONCURRENCY", "8"))
+
+    # Background generation jobs.
+    # "thread" runs workers inside each web process; "worker" leaves the
+    # queue to a separate `python run.py worker` process.
+    JOB_EXECUTION_MODE = os.getenv("JOB_EXECUTION_MODE", "thread")
+    JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "2"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    # A running job whose heartbeat is older than this is considered
+    # abandoned (worker crashed/restarted) and gets picked up again.
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "120"))
+
+    # Gemini response cache: per-process LRU in front of a DB table
+    AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    AI_CACHE_MEMORY_ENTRIES = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "512"))
+    AI_CACHE_DB_MAX_ROWS = int(os.getenv("AI_CACHE_DB_MAX_ROWS", "10000"))
+    AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    # Expired/excess rows are deleted once per this many cache writes
+    AI_CACHE_EVICT_EVERY = int(os.getenv("AI_CACHE_EVICT_EVERY", "100"))
+
+    # Model backend: "gemini" (Google Gemini API) or "fake" (offline,
+    # deterministic text with simulated latency/errors for load tests)
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+    GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+    FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+    FAKE_LLM_LATENCY_JITTER_MS = float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "200"))
+    # "fixed", "uniform", "normal" or "lognormal"
+    FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "normal")
+    FAKE_LLM_MS_PER_KCHAR = float(os.getenv("FAKE_LLM_MS_PER_KCHAR", "0"))
+    FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+    FAKE_LLM_ERROR_STATUS = int(os.getenv("FAKE_LLM_ERROR_STATUS", "503"))
+    FAKE_LLM_OUTPUT_WORDS = int(os.getenv("FAKE_LLM_OUTPUT_WORDS", "120"))
+    FAKE_LLM_SEED = int(os.environ["FAKE_LLM_SEED"]) if os.getenv("FAKE_LLM_SEED") else None
+
+    # Client-side limits on model calls (see app/llm_limits.py). Rate limit
+    # 0 means unlimited; set LLM_RATE_LIMIT_STORE to a file path to share
+    # the budget between all processes on the host.
+    LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "0"))
+    LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    LLM_RATE_LIMIT_STORE = os.getenv("LLM_RATE_LIMIT_STORE", "")
+    # Concurrent calls per process; halved on 429/5xx, grows back on success
+    LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+    LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "100"))
+    LLM_RETRY_MAX_ATTEMPTS = int(os.getenv("LLM_RETRY_MAX_ATTEMPTS", "4"))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    # Total time a call may spend waiting and retrying
+    LLM_RETRY_DEADLINE_SECONDS = float(os.getenv("LLM_RETRY_DEADLINE_SECONDS", "60"))
+
+    # Section revisions store a full snapshot every N versions and
+    # compressed deltas in between
+    REVISION_SNAPSHOT_INTERVAL = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "20"))
+
+    # Rendered .docx/.pptx files cached per worker, keyed by content hash
+    EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    EXPORT_CACHE_MAX_AGE_SECONDS = int(os.getenv("EXPORT_CACHE_MAX_AGE_SECONDS", "3600"))
+    # Rendered XML of individual sections/slides, reused when only some
+    # sections of a document changed
+    EXPORT_FRAGMENT_CACHE_MAX_BYTES = int(
+        os.getenv("EXPORT_FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+    )
+
+    # Extra .docx/.pptx base templates parsed once at start-up, as
+    # "name=path;name=path". A template named "default" replaces the bundled one.
+    DOCX_TEMPLATES = os.getenv("DOCX_TEMPLATES", "")
+    PPTX_TEMPLATES = os.getenv("PPTX_TEMPLATES", "")
+
+    # Worker processes for rendering exports; unset means one per CPU and
+    # 0 renders inline in the web process
+    RENDER_POOL_PROCESSES = (
+        int(os.environ["RENDER_POOL_PROCESSES"]) if os.getenv("RENDER_POOL_PROCESSES") else None
+    )
+    # "inline" renders single exports in the request thread; "process" sends
+    # them to the render pool so they don't hold the web worker's GIL
+    EXPORT_EXECUTION_MODE = os.getenv("EXPORT_EXECUTION_MODE", "inline")
+    RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+    # Spawn all render workers at start-up in "process" mode
+    RENDER_POOL_PREWARM = os.getenv("RENDER_POOL_PREWARM", "true").lower() == "true"
+    # Limits for POST /api/export/bulk
+    BULK_EXPORT_MAX_PROJECTS = int(os.getenv("BULK_EXPORT_MAX_PROJECTS", "50"))
+    BULK_EXPORT_MAX_BYTES = int(os.getenv("BULK_EXPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+    # Request instrumentation: Server-Timing header, slow-request log and
+    # Prometheus histograms at /metrics, behind a bearer token (without one
+    # only the debug server serves them)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+
+    # How long a worker trusts a confirmed (user, project) ownership check
+    # before asking the database again; 0 disables the cache
+    ACCESS_CACHE_TTL_SECONDS = int(os.getenv("ACCESS_CACHE_TTL_SECONDS", "30"))
+
+    # Responses to requests sent with an Idempotency-Key header are replayed
+    # for this long; a key whose first request never finished is released
+    # after the pending timeout
+    IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = int(
+        os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "300")
+    )
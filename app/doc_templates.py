@@ -0,0 +1,120 @@
+"""Parsed base templates for the docx/pptx builders.
+
+``Document()`` and ``Presentation()`` unzip and parse their bundled
+template on every call. Templates are instead parsed once per process
+and each export starts from a deep copy of the parsed tree, which skips
+the unzip and XML parsing.
+
+The bundled templates are registered as "default". Corporate templates
+are registered by name, either from config (DOCX_TEMPLATES /
+PPTX_TEMPLATES, "name=path;name=path") or with ``register_template``.
+Registering a file under "default" replaces the bundled one.
+"""
+import copy
+import os
+import threading
+
+DEFAULT = "default"
+
+_templates = {}
+_sources = {}  # (doc_type, name) -> path, for templates loaded from a file
+_lock = threading.Lock()
+
+
+def _load(doc_type, path=None):
+    if doc_type == "docx":
+        from docx import Document
+        return Document(path)
+    if doc_type == "pptx":
+        from pptx import Presentation
+        return Presentation(path)
+    raise ValueError(f"Unknown document type: {doc_type}")
+
+
+def register_template(doc_type, name, path=None):
+    """Parse ``path`` (or the bundled template) and keep it under ``name``."""
+    base = _load(doc_type, path)
+    with _lock:
+        _templates[(doc_type, name)] = base
+        if path:
+            _sources[(doc_type, name)] = path
+        else:
+            _sources.pop((doc_type, name), None)
+    return base
+
+
+def _base(doc_type, name):
+    key = (doc_type, name or DEFAULT)
+    base = _templates.get(key)
+    if base is None:
+        if key[1] != DEFAULT:
+            raise KeyError(f"No {doc_type} template registered as '{key[1]}'")
+        with _lock:
+            base = _templates.get(key)
+            if base is None:
+                base = _templates[key] = _load(doc_type)
+    return base
+
+
+def new_document(template=None):
+    """A fresh python-docx Document cloned from a registered template."""
+    return copy.deepcopy(_base("docx", template))
+
+
+def new_presentation(template=None):
+    """A fresh python-pptx Presentation cloned from a registered template."""
+    return copy.deepcopy(_base("pptx", template))
+
+
+def template_names(doc_type):
+    return sorted(name for kind, name in _templates if kind == doc_type)
+
+
+def template_version(doc_type, name=None):
+    """Identifies the file behind a template, for cache keys and ETags."""
+    name = name or DEFAULT
+    path = _sources.get((doc_type, name))
+    if path is None:
+        return f"{name}:bundled"
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = 0
+    return f"{name}:{path}:{mtime}"
+
+
+def _parse_spec(spec):
+    pairs = []
+    for item in (spec or "").split(";"):
+        if "=" in item:
+            name, path = item.split("=", 1)
+            pairs.append((name.strip(), path.strip()))
+    return pairs
+
+
+def template_specs(config):
+    """(doc_type, name, path) for the bundled templates and configured ones."""
+    specs = []
+    for doc_type, key in (("docx", "DOCX_TEMPLATES"), ("pptx", "PPTX_TEMPLATES")):
+        specs.append((doc_type, DEFAULT, None))
+        specs.extend((doc_type, name, path) for name, path in _parse_spec(config.get(key)))
+    return specs
+
+
+def register_templates(specs, log):
+    """Register template_specs() entries; failures are passed to ``log``."""
+    for doc_type, name, path in specs:
+        try:
+            register_template(doc_type, name, path)
+        except Exception as e:
+            log("Could not load %s template '%s': %s", doc_type, name, e)
+
+
+def load_templates(app):
+    """Preload the bundled templates and any configured ones at start-up.
+
+    A missing optional dependency or unreadable file is logged rather than
+    stopping the app; exports of that type fail later with a clear error.
+    Render pool workers register the same specs (app.render_pool).
+    """
+    register_templates(template_specs(app.config), app.logger.warning)
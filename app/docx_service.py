@@ -1,18 +1,64 @@
-from docx import Document
+import io
 
-def build_docx(project, sections, filepath: str):
-    doc = Document()
+import docx  # noqa: F401  (export routes report a missing python-docx on import)
+from docx.oxml import parse_xml
+from lxml import etree
+
+from app.doc_templates import new_document
+from app.export_cache import fragment_key, get_fragment, put_fragment
+
+
+def _render_section(doc, sec):
+    doc.add_heading(sec.title, level=2)
+    content = sec.current_content or ""
+    paragraphs = [p.strip() for p in content.split("\n\n") if p.strip()]
+    if not paragraphs:
+        doc.add_paragraph("")
+    else:
+        for p in paragraphs:
+            doc.add_paragraph(p)
+
+
+def _append(body, element):
+    # Body content must stay in front of the trailing section properties
+    if body.sectPr is not None:
+        body.sectPr.addprevious(element)
+    else:
+        body.append(element)
+
+
+def build_docx(project, sections, target=None, template=None):
+    """Write the file to ``target`` (a path or writable binary stream).
+
+    With no target the file is built in memory and returned as bytes.
+    ``template`` names a template registered in app.doc_templates.
+
+    Each section's paragraphs are cached as XML keyed by its title and
+    content, so after an edit only the changed sections are rendered again.
+    """
+    doc = new_document(template)
     doc.add_heading(project.title, level=1)
+    body = doc.element.body
 
     for sec in sections:
-        doc.add_heading(sec.title, level=2)
-        content = sec.current_content or ""
-        paragraphs = [p.strip() for p in content.split("\n\n") if p.strip()]
-        if not paragraphs:
-            doc.add_paragraph("")
-        else:
-            for p in paragraphs:
-                doc.add_paragraph(p)
-
-    doc.save(filepath)
-    return filepath
+        key = fragment_key("docx", template, sec.title, sec.current_content)
+        fragment = get_fragment(key)
+        if fragment is not None:
+            for element in parse_xml(fragment):
+                _append(body, element)
+            continue
+
+        start = len(body) - (1 if body.sectPr is not None else 0)
+        _render_section(doc, sec)
+        end = len(body) - (1 if body.sectPr is not None else 0)
+        put_fragment(key, b"<fragment>" + b"".join(
+            etree.tostring(element) for element in body[start:end]
+        ) + b"</fragment>")
+
+    if target is None:
+        buf = io.BytesIO()
+        doc.save(buf)
+        return buf.getvalue()
+
+    doc.save(target)
+    return target
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+from app.doc_templates import template_version
+
+
+def artifact_key(project, doc_type, sections, template=None):
+    """Content hash of everything that ends up in an exported file."""
+    raw = json.dumps(
+        {
+            "title": project.title,
+            "doc_type": doc_type,
+            "template": template_version(doc_type, template),
+            "sections": [[s.title, s.current_content or ""] for s in sections],
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def fragment_key(doc_type, template, title, content):
+    """Key for one section's rendered XML in a given base template."""
+    raw = json.dumps(
+        [doc_type, template or "default", title, content or ""],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ArtifactCache:
+    """Per-process cache of rendered export files, bounded by bytes and age."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (stored_at, bytes)
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, max_age):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or time.monotonic() - item[0] > max_age:
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, data, max_bytes):
+        if len(data) > max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key, evicted=False)
+            self._items[key] = (time.monotonic(), data)
+            self._size += len(data)
+            while self._size > max_bytes:
+                self._drop(next(iter(self._items)))
+
+    def _drop(self, key, evicted=True):
+        _, data = self._items.pop(key)
+        self._size -= len(data)
+        if evicted:
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache = ArtifactCache()
+_fragments = ArtifactCache()
+
+
+def _setting(name):
+    # Builders also run in render pool processes, which have no app context
+    if has_app_context():
+        return current_app.config[name]
+    from app.config import Config
+    return getattr(Config, name)
+
+
+def get_artifact(key):
+    return _cache.get(key, current_app.config["EXPORT_CACHE_MAX_AGE_SECONDS"])
+
+
+def put_artifact(key, data):
+    _cache.put(key, data, current_app.config["EXPORT_CACHE_MAX_BYTES"])
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def get_fragment(key):
+    return _fragments.get(key, _setting("EXPORT_CACHE_MAX_AGE_SECONDS"))
+
+
+def put_fragment(key, data):
+    _fragments.put(key, data, _setting("EXPORT_FRAGMENT_CACHE_MAX_BYTES"))
+
+
+def fragment_stats():
+    return _fragments.stats()
@@ -1,17 +1,27 @@
-import os
-import tempfile
-from flask import Blueprint, jsonify, send_file
+import io
+import time
+import zipfile
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
+from app.access import owned_project
+from app.export_cache import artifact_key, get_artifact, put_artifact
+from app.metrics import track_render
 from app.models import Project, ProjectSection
+from app.render_pool import (
+    RenderTimeout, export_record, render_many, render_one, run_cpu_bound,
+)
 
 export_bp = Blueprint("export", __name__)
 
+DOCX_MIMETYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PPTX_MIMETYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
 
 def _get_project_and_sections(project_id, user_id):
-    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
-    if not project:
-        return None, None, ("Project not found", 404)
+    project, error = owned_project(project_id, user_id)
+    if error:
+        return None, None, error
 
     sections = (
         ProjectSection.query
@@ -20,11 +30,62 @@ def _get_project_and_sections(project_id, user_id):
         .all()
     )
     if not sections:
-        return project, None, ("No sections to export", 400)
+        return project, None, (jsonify({"message": "No sections to export"}), 400)
 
     return project, sections, None
 
 
+def _safe_filename(title, fallback):
+    safe_title = "".join(
+        c if c.isalnum() or c in (" ", "-", "_") else "_" for c in title
+    )
+    return safe_title or fallback
+
+
+def _send_artifact(project, sections, kind, build, filename, mimetype):
+    """Serve an export from the artifact cache, building it only on a miss.
+
+    The content hash doubles as a strong ETag, so a client that already has
+    this exact file gets a 304 without anything being rendered.
+    """
+    key = artifact_key(project, kind, sections)
+    if request.if_none_match.contains(key):
+        resp = Response(status=304)
+        resp.set_etag(key)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+
+    data = get_artifact(key)
+    if data is None:
+        if current_app.config["EXPORT_EXECUTION_MODE"] == "process":
+            try:
+                with track_render(kind):
+                    data = render_one(
+                        current_app._get_current_object(), kind, export_record(project, sections)
+                    )
+            except RenderTimeout:
+                return jsonify({"message": "Export timed out"}), 504
+            except Exception as e:
+                current_app.logger.error("Export render failed: %s", e)
+                return jsonify({"message": "Export failed", "error": str(e)}), 500
+        else:
+            # Built in memory: nothing shared on disk between concurrent exports
+            with track_render(kind):
+                data = run_cpu_bound(build, project, sections)
+        put_artifact(key, data)
+
+    # send_file sets Content-Length from the buffer size
+    resp = send_file(
+        io.BytesIO(data),
+        as_attachment=True,
+        download_name=filename,
+        mimetype=mimetype,
+        etag=key,
+    )
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
 @export_bp.route("/projects/<int:project_id>/export/docx", methods=["GET"])
 @jwt_required()
 def export_docx(project_id):
@@ -32,15 +93,9 @@ def export_docx(project_id):
 
     project, sections, error = _get_project_and_sections(project_id, user_id)
     if error:
-        msg, code = error
-        return jsonify({"message": msg}), code
+        return error
 
-    tmp_dir = tempfile.gettempdir()
-    safe_title = "".join(
-        c if c.isalnum() or c in (" ", "-", "_") else "_" for c in project.title
-    )
-    filename = f"{safe_title or 'document'}.docx"
-    path = os.path.join(tmp_dir, filename)
+    filename = f"{_safe_filename(project.title, 'document')}.docx"
 
     try:
         from app.docx_service import build_docx
@@ -50,14 +105,7 @@ def export_docx(project_id):
             "error": str(e),
         }), 500
 
-    build_docx(project, sections, path)
-
-    return send_file(
-        path,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    )
+    return _send_artifact(project, sections, "docx", build_docx, filename, DOCX_MIMETYPE)
 
 
 @export_bp.route("/projects/<int:project_id>/export/pptx", methods=["GET"])
@@ -67,15 +115,9 @@ def export_pptx(project_id):
 
     project, sections, error = _get_project_and_sections(project_id, user_id)
     if error:
-        msg, code = error
-        return jsonify({"message": msg}), code
+        return error
 
-    tmp_dir = tempfile.gettempdir()
-    safe_title = "".join(
-        c if c.isalnum() or c in (" ", "-", "_") else "_" for c in project.title
-    )
-    filename = f"{safe_title or 'slides'}.pptx"
-    path = os.path.join(tmp_dir, filename)
+    filename = f"{_safe_filename(project.title, 'slides')}.pptx"
 
     try:
         from app.pptx_service import build_pptx
@@ -85,11 +127,123 @@ def export_pptx(project_id):
             "error": str(e),
         }), 500
 
-    build_pptx(project, sections, path)
+    return _send_artifact(project, sections, "pptx", build_pptx, filename, PPTX_MIMETYPE)
 
-    return send_file(
-        path,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-    )
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink that lets zipfile produce an archive incrementally."""
+
+    def __init__(self):
+        self._chunks = []
+        self._written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._written += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._written
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+@export_bp.route("/export/bulk", methods=["POST"])
+@jwt_required()
+def export_bulk():
+    """Export several projects as one ZIP, rendered in parallel.
+
+    Entries are streamed as soon as each document is ready, so the archive
+    order follows completion rather than the requested order.
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    project_ids = data.get("project_ids")
+
+    if (
+        not isinstance(project_ids, list)
+        or not project_ids
+        or not all(isinstance(pid, int) for pid in project_ids)
+    ):
+        return jsonify({"message": "project_ids must be a non-empty list of ids"}), 400
+
+    project_ids = list(dict.fromkeys(project_ids))
+    max_projects = current_app.config["BULK_EXPORT_MAX_PROJECTS"]
+    if len(project_ids) > max_projects:
+        return jsonify({"message": f"At most {max_projects} projects per bulk export"}), 400
+
+    projects = Project.query.filter(
+        Project.id.in_(project_ids), Project.user_id == user_id
+    ).all()
+    if len(projects) != len(project_ids):
+        return jsonify({"message": "Project not found"}), 404
+
+    sections_by_project = {pid: [] for pid in project_ids}
+    for sec in (
+        ProjectSection.query
+        .filter(ProjectSection.project_id.in_(project_ids))
+        .order_by(ProjectSection.project_id, ProjectSection.index)
+    ):
+        sections_by_project[sec.project_id].append(sec)
+
+    # Everything the generator needs is copied out here; it runs after the
+    # request's database session is gone.
+    ready, tasks, skipped = [], [], []
+    for project in sorted(projects, key=lambda p: project_ids.index(p.id)):
+        sections = sections_by_project[project.id]
+        if not sections:
+            skipped.append(f"{project.title} (id {project.id}): no sections to export")
+            continue
+        doc_type = "pptx" if project.doc_type == "pptx" else "docx"
+        name = f"{_safe_filename(project.title, 'project')}-{project.id}.{doc_type}"
+        key = artifact_key(project, doc_type, sections)
+        cached = get_artifact(key)
+        if cached is not None:
+            ready.append((name, cached))
+        else:
+            tasks.append(((name, key), doc_type, export_record(project, sections)))
+
+    app = current_app._get_current_object()
+    max_bytes = app.config["BULK_EXPORT_MAX_BYTES"]
+
+    def generate():
+        sink = _ZipStream()
+        total = 0
+        problems = list(skipped)
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_STORED) as zf:
+            def add(name, payload):
+                nonlocal total
+                if total + len(payload) > max_bytes:
+                    problems.append(f"{name}: left out, export size limit reached")
+                    return False
+                total += len(payload)
+                zf.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), payload)
+                return True
+
+            for name, payload in ready:
+                if add(name, payload):
+                    yield sink.drain()
+
+            for (name, key), payload, error in render_many(app, tasks):
+                if error is not None:
+                    app.logger.error("Bulk export of %s failed: %s", name, error)
+                    problems.append(f"{name}: render failed")
+                    continue
+                with app.app_context():
+                    put_artifact(key, payload)
+                if add(name, payload):
+                    yield sink.drain()
+
+            if problems:
+                zf.writestr("export_errors.txt", "\n".join(problems) + "\n")
+        yield sink.drain()
+
+    resp = Response(generate(), mimetype="application/zip")
+    resp.headers["Content-Disposition"] = 'attachment; filename="projects.zip"'
+    return resp
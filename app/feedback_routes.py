@@ -1,8 +1,12 @@
+from collections import defaultdict
+
 from flask import Blueprint, request, jsonify
+from sqlalchemy import case, func
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from app import db
-from app.models import Project, ProjectSection, SectionFeedback, SectionComment
+from app.access import owned_project_title, owned_section
+from app.models import ProjectSection, SectionFeedback, SectionComment
 
 feedback_bp = Blueprint("feedback", __name__)
 
@@ -12,13 +16,9 @@ feedback_bp = Blueprint("feedback", __name__)
 def add_feedback(section_id):
     user_id = int(get_jwt_identity())
 
-    section = ProjectSection.query.get(section_id)
-    if not section:
-        return jsonify({"message": "Section not found"}), 404
-
-    project = Project.query.filter_by(id=section.project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Not authorized for this section"}), 403
+    section, error = owned_section(section_id, user_id)
+    if error:
+        return error
 
     data = request.get_json() or {}
     is_like = data.get("is_like")
@@ -41,13 +41,9 @@ def add_feedback(section_id):
 def add_comment(section_id):
     user_id = int(get_jwt_identity())
 
-    section = ProjectSection.query.get(section_id)
-    if not section:
-        return jsonify({"message": "Section not found"}), 404
-
-    project = Project.query.filter_by(id=section.project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Not authorized for this section"}), 403
+    section, error = owned_section(section_id, user_id)
+    if error:
+        return error
 
     data = request.get_json() or {}
     comment_text = data.get("comment")
@@ -72,33 +68,49 @@ def get_project_comments(project_id):
     """
     user_id = int(get_jwt_identity())
 
-    # Make sure the project belongs to this user
-    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Project not found"}), 404
+    project_title, error = owned_project_title(project_id, user_id)
+    if error:
+        return error
 
     sections = (
         ProjectSection.query
-        .filter_by(project_id=project.id)
+        .filter_by(project_id=project_id)
         .order_by(ProjectSection.index)
         .all()
     )
 
+    # One query each for comments and like/dislike tallies, whatever the
+    # number of sections.
+    comments_by_section = defaultdict(list)
+    comments = (
+        SectionComment.query
+        .join(ProjectSection, SectionComment.section_id == ProjectSection.id)
+        .filter(ProjectSection.project_id == project_id)
+        .order_by(SectionComment.section_id, SectionComment.created_at, SectionComment.id)
+        .all()
+    )
+    for c in comments:
+        comments_by_section[c.section_id].append(c)
+
+    feedback_rows = (
+        db.session.query(
+            SectionFeedback.section_id,
+            func.sum(case((SectionFeedback.is_like.is_(True), 1), else_=0)),
+            func.sum(case((SectionFeedback.is_like.is_(False), 1), else_=0)),
+        )
+        .join(ProjectSection, SectionFeedback.section_id == ProjectSection.id)
+        .filter(ProjectSection.project_id == project_id)
+        .group_by(SectionFeedback.section_id)
+        .all()
+    )
+    tallies = {
+        section_id: (int(likes or 0), int(dislikes or 0))
+        for section_id, likes, dislikes in feedback_rows
+    }
+
     result = []
     for sec in sections:
-        comments = (
-            SectionComment.query
-            .filter_by(section_id=sec.id)
-            .order_by(SectionComment.created_at)
-            .all()
-        )
-        # count likes/dislikes for this section
-        likes = (
-            SectionFeedback.query.filter_by(section_id=sec.id, is_like=True).count()
-        )
-        dislikes = (
-            SectionFeedback.query.filter_by(section_id=sec.id, is_like=False).count()
-        )
+        likes, dislikes = tallies.get(sec.id, (0, 0))
         result.append({
             "section_id": sec.id,
             "section_index": sec.index,
@@ -109,14 +121,14 @@ def get_project_comments(project_id):
                     "comment": c.comment,
                     "created_at": c.created_at.isoformat() if c.created_at else None,
                 }
-                for c in comments
+                for c in comments_by_section[sec.id]
             ],
             "likes": likes,
             "dislikes": dislikes,
         })
 
     return jsonify({
-        "project_id": project.id,
-        "project_title": project.title,
+        "project_id": project_id,
+        "project_title": project_title,
         "items": result,
     })
@@ -0,0 +1,137 @@
+"""Idempotency-Key support for POST endpoints.
+
+A client may send ``Idempotency-Key: <unique string>`` with a request. The
+first request with a key claims it, and its response is stored. Later
+requests from the same user with the same key get that response replayed
+(marked ``Idempotent-Replayed: true``) instead of running again, for
+IDEMPOTENCY_KEY_TTL_SECONDS. Reusing a key for a different request is
+rejected with 422, and a retry while the first request is still running
+gets 409.
+
+Server errors (5xx) are not stored, so the client can retry them with the
+same key. A claim whose request never finished (e.g. the worker died) is
+taken over after IDEMPOTENCY_PENDING_TIMEOUT_SECONDS.
+"""
+import functools
+import hashlib
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b"\0" + request.path.encode() + b"\0")
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, request_hash):
+    """Claim ``key`` for this request.
+
+    Returns ``(claim_id, None)`` for a new claim, or ``(None, response)``
+    when the stored response (or an error) should be sent instead.
+    """
+    now = datetime.utcnow()
+    expired_before = now - timedelta(seconds=current_app.config["IDEMPOTENCY_KEY_TTL_SECONDS"])
+    pending_before = now - timedelta(
+        seconds=current_app.config["IDEMPOTENCY_PENDING_TIMEOUT_SECONDS"]
+    )
+
+    row = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if row is not None and (
+        row.created_at < expired_before
+        or (row.status_code is None and row.created_at < pending_before)
+    ):
+        db.session.delete(row)
+        db.session.flush()
+        row = None
+
+    if row is None:
+        IdempotencyKey.query.filter(IdempotencyKey.created_at < expired_before).delete(
+            synchronize_session=False
+        )
+        row = IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash)
+        db.session.add(row)
+        try:
+            db.session.flush()
+            claim_id = row.id
+            db.session.commit()
+            return claim_id, None
+        except IntegrityError:
+            # A concurrent request with the same key got there first
+            db.session.rollback()
+            row = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+            if row is None:
+                return None, (jsonify({"message": "Idempotency-Key conflict; please retry"}), 409)
+
+    if row.request_hash != request_hash:
+        return None, (
+            jsonify({"message": "Idempotency-Key was already used for a different request"}),
+            422,
+        )
+    if row.status_code is None:
+        return None, (
+            jsonify({"message": "A request with this Idempotency-Key is still in progress"}),
+            409,
+            {"Retry-After": "1"},
+        )
+
+    replay = Response(row.response_body, status=row.status_code, mimetype=row.mimetype)
+    replay.headers["Idempotent-Replayed"] = "true"
+    return None, replay
+
+
+def _release(claim_id):
+    IdempotencyKey.query.filter_by(id=claim_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a JWT-protected view.
+
+    Goes below ``@jwt_required()``. Requests without the header are not
+    affected.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"message": f"{HEADER} must be at most 255 characters"}), 400
+
+        user_id = int(get_jwt_identity())
+        claim_id, stored = _claim(user_id, key, _request_hash())
+        if stored is not None:
+            return stored
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            _release(claim_id)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            _release(claim_id)
+            return response
+
+        IdempotencyKey.query.filter_by(id=claim_id).update({
+            IdempotencyKey.status_code: response.status_code,
+            IdempotencyKey.response_body: response.get_data(as_text=True),
+            IdempotencyKey.mimetype: response.mimetype,
+        }, synchronize_session=False)
+        db.session.commit()
+        return response
+
+    return wrapper
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from app.models import GenerationJob
+from app.job_service import job_to_dict
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+@jobs_bp.route("/jobs/<int:job_id>", methods=["GET"])
+@jwt_required()
+def get_job(job_id):
+    """Report status, per-section progress, errors and timings of a job."""
+    user_id = int(get_jwt_identity())
+
+    job = GenerationJob.query.filter_by(id=job_id, user_id=user_id).first()
+    if not job:
+        return jsonify({"message": "Job not found"}), 404
+
+    return jsonify(job_to_dict(job))
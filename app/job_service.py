@@ -0,0 +1,351 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import and_, func, insert, or_
+
+from app import db
+from app.ai_service import generate_outline_content, generate_section_content
+from app.models import (
+    GenerationJob,
+    GenerationJobSection,
+    Project,
+    ProjectSection,
+)
+from app.revision_service import record_revisions
+
+# Wakes idle in-process workers as soon as a job is enqueued instead of
+# waiting for the next poll.
+_wakeup = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def _worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def snapshot(obj, *fields):
+    """Detached copy of an ORM row for use outside the owning session/thread."""
+    return SimpleNamespace(**{f: getattr(obj, f) for f in fields})
+
+
+def _generate_one(app, project, sec, use_cache=True):
+    """Generate a single section inside a worker thread.
+
+    Failures are handled per section so one bad call does not affect the
+    others. Returns (text, error).
+    """
+    old_text = sec.current_content
+    with app.app_context():
+        try:
+            return generate_section_content(project, sec, use_cache=use_cache), None
+        except Exception as e:
+            # Do NOT crash the whole job – log and fallback
+            print("AI generation error for section", sec.id, ":", e)
+            return old_text or "(AI generation failed; please try again.)", str(e)
+
+
+def _generate_batch(app, project, sections, use_cache=True):
+    """One structured call for many sections; returns {index: text}, possibly partial."""
+    with app.app_context():
+        try:
+            return generate_outline_content(project, sections, use_cache=use_cache)
+        except Exception as e:
+            print("AI batch generation error for project", project.id, ":", e)
+            return {}
+
+
+def active_job_for_project(project_id):
+    return (
+        GenerationJob.query
+        .filter(
+            GenerationJob.project_id == project_id,
+            GenerationJob.status.in_(("queued", "running")),
+        )
+        .order_by(GenerationJob.created_at.desc())
+        .first()
+    )
+
+
+def create_generation_job(project, sections, use_cache=True, mode="section"):
+    job = GenerationJob(
+        project_id=project.id,
+        user_id=project.user_id,
+        status="queued",
+        mode=mode,
+        use_cache=use_cache,
+    )
+    db.session.add(job)
+    db.session.flush()
+    db.session.execute(insert(GenerationJobSection), [
+        {"job_id": job.id, "section_id": sec.id, "index": sec.index, "status": "pending"}
+        for sec in sections
+    ])
+    db.session.commit()
+    _wakeup.set()
+    return job
+
+
+def _claimable(stale_before):
+    return or_(
+        GenerationJob.status == "queued",
+        and_(
+            GenerationJob.status == "running",
+            GenerationJob.heartbeat_at < stale_before,
+        ),
+    )
+
+
+def claim_next_job(app, worker_id):
+    """Atomically take ownership of the oldest queued or abandoned job."""
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=app.config["JOB_STALE_SECONDS"])
+
+    candidate = (
+        GenerationJob.query
+        .filter(_claimable(stale_before))
+        .order_by(GenerationJob.created_at)
+        .first()
+    )
+    if not candidate:
+        db.session.rollback()
+        return None
+
+    # Conditional update so two workers racing on the same row cannot both win
+    claimed = (
+        GenerationJob.query
+        .filter(GenerationJob.id == candidate.id, _claimable(stale_before))
+        .update(
+            {
+                GenerationJob.status: "running",
+                GenerationJob.worker_id: worker_id,
+                GenerationJob.heartbeat_at: now,
+                GenerationJob.started_at: func.coalesce(GenerationJob.started_at, now),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.session.commit()
+    return candidate.id if claimed else None
+
+
+def _heartbeat(job_id):
+    GenerationJob.query.filter_by(id=job_id).update(
+        {GenerationJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def run_job(app, job_id):
+    """Generate every unfinished section of a claimed job.
+
+    Each section is committed as soon as it (and every section before it) is
+    done, so a restarted worker only redoes the sections that never finished.
+    """
+    with app.app_context():
+        job = GenerationJob.query.get(job_id)
+        project = Project.query.get(job.project_id)
+
+        todo = [
+            js for js in job.sections if js.status in ("pending", "running")
+        ]
+        section_map = {
+            s.id: s
+            for s in ProjectSection.query.filter(
+                ProjectSection.id.in_([js.section_id for js in todo])
+            ).all()
+        } if todo else {}
+
+        now = datetime.utcnow()
+        for js in todo:
+            js.status = "running"
+            js.started_at = now
+            js.error = None
+        db.session.commit()
+
+        runnable = [js for js in todo if js.section_id in section_map]
+        for js in todo:
+            if js.section_id not in section_map:
+                js.status = "failed"
+                js.error = "Section no longer exists"
+                js.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        use_cache = job.use_cache is not False
+        heartbeat_every = max(1.0, app.config["JOB_STALE_SECONDS"] / 4)
+
+        # Worker threads only ever see detached copies: the session below
+        # keeps committing (and expiring) the real rows while they run.
+        project_data = snapshot(project, "id", "title", "doc_type", "main_topic")
+        section_data = {
+            js.id: snapshot(section_map[js.section_id], "id", "index", "title", "current_content")
+            for js in runnable
+        }
+
+        def wait(fut):
+            while True:
+                try:
+                    return fut.result(timeout=heartbeat_every)
+                except FutureTimeout:
+                    _heartbeat(job_id)
+
+        def save(results):
+            """Persist [(job section, text, error, started)] with one bulk revision insert."""
+            record_revisions([
+                (section_map[js.section_id], new_text, None)
+                for js, new_text, _, _ in results
+            ])
+            finished = datetime.utcnow()
+            for js, _, error, started in results:
+                js.status = "failed" if error else "done"
+                js.error = error
+                js.finished_at = finished
+                js.duration_ms = int((time.perf_counter() - started) * 1000)
+            job.heartbeat_at = finished
+            db.session.commit()
+
+        workers = max(1, min(app.config["AI_GENERATION_CONCURRENCY"], len(runnable) or 1))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            if job.mode == "batch" and runnable:
+                batch_started = time.perf_counter()
+                answered = wait(pool.submit(
+                    _generate_batch, app, project_data,
+                    [section_data[js.id] for js in runnable], use_cache,
+                ))
+                save([
+                    (js, answered[section_data[js.id].index], None, batch_started)
+                    for js in runnable
+                    if section_data[js.id].index in answered
+                ])
+                # Whatever the batched answer left out goes through the
+                # per-section path below
+                runnable = [
+                    js for js in runnable if section_data[js.id].index not in answered
+                ]
+
+            started = {}
+            futures = []
+            for js in runnable:
+                started[js.id] = time.perf_counter()
+                futures.append(pool.submit(
+                    _generate_one, app, project_data, section_data[js.id], use_cache,
+                ))
+
+            # Persist in index order as results arrive. Everything already
+            # finished behind the section we waited on goes into the same
+            # bulk write, so a pass usually costs only a few inserts.
+            i = 0
+            while i < len(runnable):
+                ready = [(runnable[i], *wait(futures[i]), started[runnable[i].id])]
+                i += 1
+                while i < len(runnable) and futures[i].done():
+                    ready.append((runnable[i], *futures[i].result(), started[runnable[i].id]))
+                    i += 1
+                save(ready)
+
+        project.status = "generated"
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def process_next_job(app, worker_id=None):
+    """Claim and run one job. Returns the job id, or None if the queue is empty."""
+    worker_id = worker_id or _worker_id()
+    with app.app_context():
+        job_id = claim_next_job(app, worker_id)
+    if job_id is None:
+        return None
+
+    try:
+        run_job(app, job_id)
+    except Exception as e:
+        app.logger.exception("Generation job %s failed", job_id)
+        with app.app_context():
+            db.session.rollback()
+            GenerationJob.query.filter_by(id=job_id).update(
+                {
+                    GenerationJob.status: "failed",
+                    GenerationJob.error: str(e),
+                    GenerationJob.finished_at: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            db.session.commit()
+    return job_id
+
+
+def run_worker(app, stop_event=None):
+    """Poll the job table forever (or until stop_event is set)."""
+    worker_id = _worker_id()
+    poll = app.config["JOB_POLL_INTERVAL"]
+    while stop_event is None or not stop_event.is_set():
+        try:
+            job_id = process_next_job(app, worker_id)
+        except Exception:
+            app.logger.exception("Job worker %s poll failed", worker_id)
+            job_id = None
+        if job_id is None:
+            _wakeup.wait(poll)
+            _wakeup.clear()
+
+
+def start_background_workers(app):
+    """Start in-process worker threads (JOB_EXECUTION_MODE=thread)."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+    for i in range(app.config["JOB_WORKER_THREADS"]):
+        t = threading.Thread(
+            target=run_worker,
+            args=(app,),
+            name=f"generation-worker-{i}",
+            daemon=True,
+        )
+        t.start()
+
+
+def job_to_dict(job):
+    sections = job.sections
+    counts = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+    for js in sections:
+        counts[js.status] = counts.get(js.status, 0) + 1
+
+    end = job.finished_at or datetime.utcnow()
+    return {
+        "id": job.id,
+        "project_id": job.project_id,
+        "status": job.status,
+        "mode": job.mode,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "elapsed_ms": int((end - job.started_at).total_seconds() * 1000)
+        if job.started_at else None,
+        "progress": {
+            "total": len(sections),
+            "completed": counts["done"] + counts["failed"],
+            **counts,
+        },
+        "sections": [
+            {
+                "section_id": js.section_id,
+                "index": js.index,
+                "status": js.status,
+                "error": js.error,
+                "started_at": js.started_at.isoformat() if js.started_at else None,
+                "finished_at": js.finished_at.isoformat() if js.finished_at else None,
+                "duration_ms": js.duration_ms,
+            }
+            for js in sections
+        ],
+    }
@@ -0,0 +1,229 @@
+import abc
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+from app.config import Config
+
+
+class LLMBackendError(Exception):
+    """Error raised by a backend, carrying the HTTP-ish status when known."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMBackend(abc.ABC):
+    """Minimal interface ai_service needs from a model provider.
+
+    A subclass that leaves out either method can't be instantiated.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def generate(self, model, prompt, params=None):
+        """Return the full response text."""
+
+    @abc.abstractmethod
+    def stream(self, model, prompt, params=None):
+        """Yield response text chunks as they are produced."""
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # Built on first use so a missing key or SDK only fails the AI calls
+        # themselves, not app start-up.
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not self.api_key:
+                        raise RuntimeError("GOOGLE_API_KEY is not set")
+                    from google import genai
+
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def _config(self, params):
+        if not params:
+            return None
+        from google.genai import types
+
+        return types.GenerateContentConfig(**params)
+
+    def generate(self, model, prompt, params=None):
+        resp = self.client.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=self._config(params),
+        )
+        return resp.text
+
+    def stream(self, model, prompt, params=None):
+        chunks = self.client.models.generate_content_stream(
+            model=model,
+            contents=prompt,
+            config=self._config(params),
+        )
+        for chunk in chunks:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeBackend(LLMBackend):
+    """Offline backend for load tests and local development.
+
+    Output is derived from a hash of the prompt, so the same prompt always
+    gets the same text. Latency and failures are drawn from a seeded RNG.
+    JSON-mode requests for an outline ("1. Title" lines) get a JSON array
+    with one entry per outline line, like the batched Gemini answer.
+    """
+
+    name = "fake"
+
+    WORDS = (
+        "strategy growth market customer revenue platform team delivery "
+        "quality risk roadmap insight value process data cost scale "
+        "partner launch metric"
+    ).split()
+
+    def __init__(
+        self,
+        latency_ms=800.0,
+        latency_jitter_ms=200.0,
+        distribution="normal",
+        ms_per_kchar=0.0,
+        error_rate=0.0,
+        error_status=503,
+        output_words=120,
+        seed=None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.distribution = distribution
+        self.ms_per_kchar = ms_per_kchar
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.output_words = output_words
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _latency_s(self, prompt, output):
+        with self._lock:
+            if self.distribution == "fixed":
+                ms = self.latency_ms
+            elif self.distribution == "uniform":
+                ms = self._rng.uniform(
+                    self.latency_ms - self.latency_jitter_ms,
+                    self.latency_ms + self.latency_jitter_ms,
+                )
+            elif self.distribution == "lognormal":
+                # Median latency_ms with a long right tail
+                sigma = self.latency_jitter_ms / self.latency_ms if self.latency_ms else 0
+                ms = self.latency_ms * self._rng.lognormvariate(0, sigma)
+            else:
+                ms = self._rng.gauss(self.latency_ms, self.latency_jitter_ms)
+        ms += self.ms_per_kchar * (len(prompt) + len(output)) / 1000
+        return max(0.0, ms) / 1000
+
+    def _maybe_fail(self):
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            raise LLMBackendError("Fake backend injected failure", self.error_status)
+
+    def _text(self, prompt, words=None):
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+        rng = random.Random(seed)
+        return " ".join(rng.choice(self.WORDS) for _ in range(words or self.output_words))
+
+    def _output(self, prompt, params):
+        if (params or {}).get("response_mime_type") == "application/json":
+            outline = re.findall(r"^(\d+)\. (.+)$", prompt, re.M)
+            return json.dumps([
+                {"index": int(idx), "content": self._text(prompt + title)}
+                for idx, title in outline
+            ])
+        return self._text(prompt)
+
+    def generate(self, model, prompt, params=None):
+        output = self._output(prompt, params)
+        time.sleep(self._latency_s(prompt, output))
+        self._maybe_fail()
+        return output
+
+    def stream(self, model, prompt, params=None):
+        output = self._output(prompt, params)
+        total = self._latency_s(prompt, output)
+        words = output.split(" ")
+        chunks = [" ".join(words[i:i + 8]) for i in range(0, len(words), 8)]
+
+        # Roughly a third of the time goes to the first token
+        time.sleep(total * 0.3)
+        self._maybe_fail()
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(total * 0.7 / len(chunks))
+            yield chunk if i == len(chunks) - 1 else chunk + " "
+
+
+_backend = None
+_backend_key = None
+_backend_lock = threading.Lock()
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def _build_backend(name):
+    if name == "fake":
+        return FakeBackend(
+            latency_ms=_setting("FAKE_LLM_LATENCY_MS"),
+            latency_jitter_ms=_setting("FAKE_LLM_LATENCY_JITTER_MS"),
+            distribution=_setting("FAKE_LLM_LATENCY_DISTRIBUTION"),
+            ms_per_kchar=_setting("FAKE_LLM_MS_PER_KCHAR"),
+            error_rate=_setting("FAKE_LLM_ERROR_RATE"),
+            error_status=_setting("FAKE_LLM_ERROR_STATUS"),
+            output_words=_setting("FAKE_LLM_OUTPUT_WORDS"),
+            seed=_setting("FAKE_LLM_SEED"),
+        )
+    if name == "gemini":
+        return GeminiBackend(_setting("GOOGLE_API_KEY"))
+    raise ValueError(f"Unknown LLM_BACKEND {name!r}")
+
+
+def get_backend():
+    """Backend selected by LLM_BACKEND, built once per process."""
+    global _backend, _backend_key
+    name = _setting("LLM_BACKEND")
+    if _backend is None or _backend_key != name:
+        with _backend_lock:
+            if _backend is None or _backend_key != name:
+                _backend = _build_backend(name)
+                _backend_key = name
+    return _backend
+
+
+def set_backend(backend):
+    """Install a specific backend instance (benchmarks, scripts)."""
+    global _backend, _backend_key
+    with _backend_lock:
+        _backend = backend
+        _backend_key = _setting("LLM_BACKEND")
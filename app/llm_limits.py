@@ -0,0 +1,332 @@
+"""Client-side rate limiting, adaptive concurrency and retries for model calls.
+
+Every backend call made by ai_service goes through ``call``/``stream``:
+
+1. A token bucket caps the request rate at LLM_RATE_LIMIT_PER_MINUTE
+   (bursts of up to LLM_RATE_LIMIT_BURST). The bucket lives in this
+   process, or in LLM_RATE_LIMIT_STORE, a small file shared by every
+   process on the machine through flock.
+2. An AIMD limit caps concurrent calls. The limit grows by about one per
+   round of successful calls, up to LLM_CONCURRENCY_MAX. A 429 or 5xx
+   halves it, down to LLM_CONCURRENCY_MIN.
+3. Failures with a 429/5xx status, and connection errors, are retried with
+   exponential backoff and full jitter. Retries stop after
+   LLM_RETRY_MAX_ATTEMPTS attempts or when LLM_RETRY_DEADLINE_SECONDS has
+   passed since the first attempt.
+
+Waiting for a token or a slot counts against the same deadline. When it
+runs out, ``LLMThrottled`` is raised so that callers can answer "busy, try
+later" instead of piling on more retries.
+"""
+import os
+import random
+import struct
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+from app.config import Config
+from app.llm_backends import LLMBackendError
+from app.metrics import AI_WAIT_SECONDS
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Overload signals closer together than this count as one (a burst of
+# failures from calls that were already in flight)
+_DECREASE_COOLDOWN_SECONDS = 1.0
+
+
+class LLMThrottled(LLMBackendError):
+    """Gave up waiting for capacity, or retried until the deadline."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config[name]
+    return getattr(Config, name)
+
+
+def error_status(exc):
+    """HTTP status of a backend error, if it has one.
+
+    LLMBackendError carries ``status_code``; google-genai's APIError carries
+    ``code``.
+    """
+    for attr in ("status_code", "code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def _is_retryable(exc):
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Dropped connections and timeouts from the HTTP client
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in (
+        "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",
+    )
+
+
+class TokenBucket:
+    """In-process token bucket; ``rate`` tokens per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Take a token; returns 0, or the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket kept in a file so every local process shares one budget."""
+
+    _FORMAT = "dd"  # tokens, wall-clock time of last update
+
+    def __init__(self, rate, burst, path):
+        super().__init__(rate, burst)
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        os.close(fd)
+
+    def take(self):
+        import fcntl
+
+        with self._lock, open(self.path, "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                raw = f.read(struct.calcsize(self._FORMAT))
+                now = time.time()
+                if len(raw) == struct.calcsize(self._FORMAT):
+                    tokens, updated = struct.unpack(self._FORMAT, raw)
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                else:
+                    tokens = float(self.burst)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                f.seek(0)
+                f.write(struct.pack(self._FORMAT, tokens, now))
+                f.truncate()
+                return wait
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent calls."""
+
+    def __init__(self, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, overloaded=False):
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease >= _DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {
+            "calls": 0,
+            "retries": 0,
+            "overloaded": 0,
+            "throttled": 0,
+        }
+        self.retries_by_status = {}
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def retried(self, status):
+        with self._lock:
+            self.counts["retries"] += 1
+            key = str(status) if status is not None else "network"
+            self.retries_by_status[key] = self.retries_by_status.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts), dict(self.retries_by_status)
+
+
+stats = _Stats()
+
+
+class CallGuard:
+    def __init__(self, per_minute, burst, store, min_concurrency, max_concurrency,
+                 max_attempts, base_delay, max_delay, deadline_seconds):
+        if per_minute > 0:
+            rate = per_minute / 60.0
+            burst = max(1, burst)
+            self.bucket = FileTokenBucket(rate, burst, store) if store else TokenBucket(rate, burst)
+        else:
+            self.bucket = None
+        self.concurrency = AdaptiveConcurrency(max(1, min_concurrency), max(1, max_concurrency))
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline_seconds = deadline_seconds
+
+    def _admit(self, kind, deadline):
+        """Wait for a rate-limit token and a concurrency slot."""
+        start = time.monotonic()
+        try:
+            while self.bucket is not None:
+                wait = self.bucket.take()
+                if not wait:
+                    break
+                if time.monotonic() + wait > deadline:
+                    stats.incr("throttled")
+                    raise LLMThrottled("Model rate limit reached", retry_after=wait)
+                time.sleep(wait)
+            if not self.concurrency.acquire(deadline):
+                stats.incr("throttled")
+                raise LLMThrottled("Too many model calls in flight")
+        finally:
+            AI_WAIT_SECONDS.observe(time.monotonic() - start, kind)
+        stats.incr("calls")
+
+    def _backoff(self, attempt, exc, deadline):
+        """Sleep before the next attempt, or re-raise if we shouldn't retry."""
+        if not _is_retryable(exc):
+            raise exc
+        if attempt >= self.max_attempts:
+            stats.incr("throttled")
+            raise LLMThrottled(f"Model call failed {attempt} times: {exc}") from exc
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if time.monotonic() + delay >= deadline:
+            stats.incr("throttled")
+            raise LLMThrottled(f"Model call still failing after {attempt} attempts: {exc}") from exc
+        stats.retried(error_status(exc))
+        time.sleep(delay)
+
+    def _release(self, exc=None):
+        overloaded = exc is not None and error_status(exc) in RETRYABLE_STATUSES
+        if overloaded:
+            stats.incr("overloaded")
+        self.concurrency.release(overloaded)
+
+    def call(self, kind, fn):
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit(kind, deadline)
+            try:
+                result = fn()
+            except Exception as e:
+                self._release(e)
+                self._backoff(attempt, e, deadline)
+                continue
+            self._release()
+            return result
+
+    def stream(self, kind, start):
+        """Like ``call`` for a streaming response.
+
+        ``start()`` returns the chunk iterator. Only failures before the
+        first chunk are retried; after that the caller has already seen
+        part of the text.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit(kind, deadline)
+            started = False
+            error = None
+            try:
+                for chunk in start():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                error = e
+                if started:
+                    raise
+            finally:
+                self._release(error)
+            self._backoff(attempt, error, deadline)
+
+
+_guard = None
+_guard_key = None
+_guard_lock = threading.Lock()
+
+_SETTINGS = (
+    "LLM_RATE_LIMIT_PER_MINUTE", "LLM_RATE_LIMIT_BURST", "LLM_RATE_LIMIT_STORE",
+    "LLM_CONCURRENCY_MIN", "LLM_CONCURRENCY_MAX", "LLM_RETRY_MAX_ATTEMPTS",
+    "LLM_RETRY_BASE_DELAY", "LLM_RETRY_MAX_DELAY", "LLM_RETRY_DEADLINE_SECONDS",
+)
+
+
+def get_guard():
+    """The process-wide CallGuard, rebuilt if its settings change."""
+    global _guard, _guard_key
+    key = tuple(_setting(name) for name in _SETTINGS)
+    if _guard is None or _guard_key != key:
+        with _guard_lock:
+            if _guard is None or _guard_key != key:
+                _guard = CallGuard(*key)
+                _guard_key = key
+    return _guard
+
+
+def call(kind, fn):
+    return get_guard().call(kind, fn)
+
+
+def stream(kind, start):
+    return get_guard().stream(kind, start)
+
+
+def limiter_state():
+    counts, retries = stats.snapshot()
+    guard = _guard
+    if guard is not None:
+        counts["concurrency_limit"] = guard.concurrency.limit
+        counts["in_flight"] = guard.concurrency.in_flight
+    return counts, retries
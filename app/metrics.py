@@ -0,0 +1,292 @@
+"""Per-request timing: Server-Timing header, slow-request log and /metrics.
+
+Each request accumulates SQL statement count and time (SQLAlchemy engine
+events), model call time and export render time in a thread-local
+``RequestTimings``. After the request the totals are:
+
+- sent back in a ``Server-Timing`` header (visible in browser devtools),
+- logged when the request took longer than SLOW_REQUEST_MS,
+- added to Prometheus histograms served at GET /metrics.
+
+Model call retries, throttling and the adaptive concurrency limit from
+app.llm_limits are exported too. Model calls and renders outside a request (job workers, SSE worker
+threads) still feed the ai/render histograms.
+
+Metrics are per process; with several gunicorn workers each one reports
+its own numbers, so scrape them through the process or sum in Prometheus.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, current_app, request
+from sqlalchemy import event
+
+from app import db
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_local = threading.local()
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with a fixed label set."""
+
+    def __init__(self, name, help_text, labels, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            items = [(labels, list(series)) for labels, series in items]
+        for label_values, series in items:
+            base = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values)
+            )
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "smartdoc_request_duration_seconds", "Request wall time.",
+    ("endpoint", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "smartdoc_request_db_queries", "SQL statements per request.",
+    ("endpoint",), COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "smartdoc_request_db_seconds", "Time spent in SQL per request.", ("endpoint",),
+)
+AI_CALL_SECONDS = Histogram(
+    "smartdoc_ai_call_seconds", "Model backend call time (cache misses only).", ("kind",),
+)
+RENDER_SECONDS = Histogram(
+    "smartdoc_export_render_seconds", "Export render time.", ("doc_type",),
+)
+AI_WAIT_SECONDS = Histogram(
+    "smartdoc_ai_wait_seconds",
+    "Time model calls waited for a rate-limit token or concurrency slot.", ("kind",),
+)
+
+HISTOGRAMS = [
+    REQUEST_SECONDS, REQUEST_QUERIES, REQUEST_DB_SECONDS, AI_CALL_SECONDS, AI_WAIT_SECONDS,
+    RENDER_SECONDS,
+]
+
+
+class RequestTimings:
+    __slots__ = ("start", "sql_count", "sql_seconds", "ai_count", "ai_seconds", "render_seconds")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.ai_count = 0
+        self.ai_seconds = 0.0
+        self.render_seconds = 0.0
+
+
+def current_timings():
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def track_ai(kind):
+    """Time a model call; ``kind`` is "generate" or "stream"."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        AI_CALL_SECONDS.observe(elapsed, kind)
+        timings = current_timings()
+        if timings is not None:
+            timings.ai_count += 1
+            timings.ai_seconds += elapsed
+
+
+@contextmanager
+def track_render(doc_type):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        RENDER_SECONDS.observe(elapsed, doc_type)
+        timings = current_timings()
+        if timings is not None:
+            timings.render_seconds += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_timings() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings()
+    starts = conn.info.get("query_start")
+    if timings is not None and starts:
+        timings.sql_count += 1
+        timings.sql_seconds += time.perf_counter() - starts.pop()
+
+
+def _start_request():
+    _local.timings = RequestTimings()
+
+
+def _finish_request(response):
+    timings = current_timings()
+    _local.timings = None
+    if timings is None:
+        return response
+
+    total = time.perf_counter() - timings.start
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(total, endpoint, request.method, str(response.status_code))
+    REQUEST_QUERIES.observe(timings.sql_count, endpoint)
+    REQUEST_DB_SECONDS.observe(timings.sql_seconds, endpoint)
+
+    parts = [f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.sql_count} queries"']
+    if timings.ai_count:
+        parts.append(f'ai;dur={timings.ai_seconds * 1000:.1f};desc="{timings.ai_count} calls"')
+    if timings.render_seconds:
+        parts.append(f"render;dur={timings.render_seconds * 1000:.1f}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(parts)
+
+    if total * 1000 >= current_app.config["SLOW_REQUEST_MS"]:
+        current_app.logger.warning(
+            "Slow request: %s %s -> %s in %.0fms (db %d queries/%.0fms, ai %d calls/%.0fms, render %.0fms)",
+            request.method, request.path, response.status_code, total * 1000,
+            timings.sql_count, timings.sql_seconds * 1000,
+            timings.ai_count, timings.ai_seconds * 1000,
+            timings.render_seconds * 1000,
+        )
+    return response
+
+
+def _teardown_request(exc):
+    # after_request is skipped when a view raises; don't leak into the next request
+    _local.timings = None
+
+
+def _cache_lines():
+    from app import ai_cache, export_cache
+
+    lines = [
+        "# HELP smartdoc_cache_events_total Cache hits, misses and evictions.",
+        "# TYPE smartdoc_cache_events_total counter",
+    ]
+    ai = ai_cache.stats.snapshot()
+    for name in ("memory_hits", "db_hits", "misses", "bypassed", "memory_evictions", "db_evictions", "expired"):
+        if name in ai:
+            lines.append(f'smartdoc_cache_events_total{{cache="ai",event="{name}"}} {ai[name]}')
+    sizes = []
+    for cache, stats in (("export", export_cache.cache_stats()), ("fragment", export_cache.fragment_stats())):
+        for name in ("hits", "misses", "evictions"):
+            lines.append(f'smartdoc_cache_events_total{{cache="{cache}",event="{name}"}} {stats[name]}')
+        sizes.append(f'smartdoc_cache_bytes{{cache="{cache}"}} {stats["bytes"]}')
+    lines += ["# HELP smartdoc_cache_bytes Bytes held by in-process caches.",
+              "# TYPE smartdoc_cache_bytes gauge"] + sizes
+    lines += ["# HELP smartdoc_cache_entries Entries held by in-process caches.",
+              "# TYPE smartdoc_cache_entries gauge",
+              f'smartdoc_cache_entries{{cache="ai"}} {ai_cache.memory_entries()}']
+    return lines
+
+
+def _limiter_lines():
+    from app import llm_limits, singleflight
+
+    counts, retries = llm_limits.limiter_state()
+    lines = [
+        "# HELP smartdoc_ai_calls_total Model call attempts, overload responses and calls given up.",
+        "# TYPE smartdoc_ai_calls_total counter",
+    ]
+    for name in ("calls", "overloaded", "throttled"):
+        lines.append(f'smartdoc_ai_calls_total{{event="{name}"}} {counts[name]}')
+    lines += [
+        "# HELP smartdoc_ai_retries_total Model call retries by failure status.",
+        "# TYPE smartdoc_ai_retries_total counter",
+    ]
+    for status, n in sorted(retries.items()):
+        lines.append(f'smartdoc_ai_retries_total{{status="{status}"}} {n}')
+    lines += [
+        "# HELP smartdoc_coalesced_requests_total Requests that shared an identical in-flight request's result.",
+        "# TYPE smartdoc_coalesced_requests_total counter",
+    ]
+    for name, n in sorted(singleflight.coalesced_counts().items()):
+        lines.append(f'smartdoc_coalesced_requests_total{{endpoint="{name}"}} {n}')
+    if "concurrency_limit" in counts:
+        lines += [
+            "# HELP smartdoc_ai_concurrency Adaptive model call concurrency limit and calls in flight.",
+            "# TYPE smartdoc_ai_concurrency gauge",
+            f'smartdoc_ai_concurrency{{value="limit"}} {counts["concurrency_limit"]:.2f}',
+            f'smartdoc_ai_concurrency{{value="in_flight"}} {counts["in_flight"]}',
+        ]
+    return lines
+
+
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        # Without a token the metrics are only served by the debug server
+        if not current_app.debug:
+            return Response("not found\n", status=404, mimetype="text/plain")
+    elif request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    lines.extend(_cache_lines())
+    lines.extend(_limiter_lines())
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    if not app.config["METRICS_TOKEN"]:
+        app.logger.warning("METRICS_TOKEN is not set; /metrics is only served in debug mode")
@@ -15,6 +15,10 @@ class User(db.Model):
 
 class Project(db.Model):
     __tablename__ = "projects"
+    __table_args__ = (
+        # Dashboard: a user's projects, newest first
+        db.Index("ix_projects_user_created", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -22,6 +26,9 @@ class Project(db.Model):
     doc_type = db.Column(db.String(10), nullable=False)  # "docx" or "pptx"
     main_topic = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(50), default="configured")
+    # Bumped whenever any section's content or the section structure
+    # changes; part of the project's ETag
+    content_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -32,12 +39,17 @@ class Project(db.Model):
 
 class ProjectSection(db.Model):
     __tablename__ = "project_sections"
+    __table_args__ = (
+        db.Index("ix_project_sections_project_index", "project_id", "index"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False)
     index = db.Column(db.Integer, nullable=False)  # order of section/slide
     title = db.Column(db.String(255), nullable=False)
     current_content = db.Column(db.Text, nullable=True)
+    # Highest SectionRevision.version; bumped atomically by revision_service
+    latest_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -50,6 +62,11 @@ class ProjectSection(db.Model):
 
 class SectionRevision(db.Model):
     __tablename__ = "section_revisions"
+    __table_args__ = (
+        db.Index(
+            "uq_section_revisions_section_version", "section_id", "version", unique=True
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     section_id = db.Column(
@@ -57,13 +74,22 @@ class SectionRevision(db.Model):
     )
     version = db.Column(db.Integer, nullable=False)
     prompt = db.Column(db.Text, nullable=True)
+    # Content is stored in ``payload``: a zlib-compressed full snapshot, or a
+    # compressed delta against the previous version (see revision_service).
+    # old_content/new_content are only set on rows written before that.
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    payload = db.Column(db.LargeBinary, nullable=True)
     old_content = db.Column(db.Text, nullable=True)
-    new_content = db.Column(db.Text, nullable=False)
+    new_content = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class SectionFeedback(db.Model):
     __tablename__ = "section_feedback"
+    __table_args__ = (
+        # Like/dislike counts per section are answered from the index alone
+        db.Index("ix_section_feedback_section_like", "section_id", "is_like"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     section_id = db.Column(
@@ -75,6 +101,9 @@ class SectionFeedback(db.Model):
 
 class SectionComment(db.Model):
     __tablename__ = "section_comments"
+    __table_args__ = (
+        db.Index("ix_section_comments_section_created", "section_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     section_id = db.Column(
@@ -82,3 +111,82 @@ class SectionComment(db.Model):
     )
     comment = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class GenerationJob(db.Model):
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        # Workers poll for the oldest claimable job; the API looks up a
+        # project's active job
+        db.Index("ix_generation_jobs_status_created", "status", "created_at"),
+        db.Index("ix_generation_jobs_project_status", "project_id", "status"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    status = db.Column(db.String(20), default="queued")  # queued/running/completed/failed
+    mode = db.Column(db.String(20), default="section")  # "section" or "batch"
+    use_cache = db.Column(db.Boolean, default=True)
+    error = db.Column(db.Text, nullable=True)
+    worker_id = db.Column(db.String(255), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    sections = db.relationship(
+        "GenerationJobSection",
+        backref="job",
+        lazy=True,
+        order_by="GenerationJobSection.index",
+    )
+
+
+class GenerationJobSection(db.Model):
+    __tablename__ = "generation_job_sections"
+    __table_args__ = (
+        db.Index("ix_generation_job_sections_job_index", "job_id", "index"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey("generation_jobs.id"), nullable=False)
+    section_id = db.Column(
+        db.Integer, db.ForeignKey("project_sections.id"), nullable=False
+    )
+    index = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default="pending")  # pending/running/done/failed
+    error = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+
+
+class AIResponseCache(db.Model):
+    __tablename__ = "ai_response_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 hex
+    model = db.Column(db.String(100), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class IdempotencyKey(db.Model):
+    """Stored response for a request sent with an Idempotency-Key header."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # sha256 of method, path and body; a reused key with a different request is rejected
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL while the first request is still being handled
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
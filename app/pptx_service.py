@@ -1,29 +1,69 @@
-from pptx import Presentation
+import io
 
-def build_pptx(project, sections, filepath: str):
-    prs = Presentation()
+import pptx  # noqa: F401  (export routes report a missing python-pptx on import)
+from lxml import etree
+from pptx.oxml import parse_xml
 
-    for sec in sections:
-        layout = prs.slide_layouts[1]  # Title + Content
-        slide = prs.slides.add_slide(layout)
+from app.doc_templates import new_presentation
+from app.export_cache import fragment_key, get_fragment, put_fragment
+
+
+def _render_slide(slide, sec):
+    slide.shapes.title.text = sec.title
+
+    content = sec.current_content or ""
+    lines = [l.strip() for l in content.split("\n") if l.strip()]
+
+    body = slide.placeholders[1]
+    tf = body.text_frame
+
+    first = True
+    for line in lines:
+        if first:
+            tf.text = line
+            first = False
+        else:
+            p = tf.add_paragraph()
+            p.text = line
+            p.level = 0
 
-        slide.shapes.title.text = sec.title
 
-        content = sec.current_content or ""
-        lines = [l.strip() for l in content.split("\n") if l.strip()]
+def _add_cached_slide(prs, layout, fragment):
+    # Skips cloning the layout's placeholders (the slow part of
+    # add_slide); the cached shape tree already contains them.
+    rId, slide = prs.part.add_slide(layout)
+    prs.slides._sldIdLst.add_sldId(rId)
+    slide._element.replace(slide._element.cSld, parse_xml(fragment))
+    return slide
 
-        body = slide.placeholders[1]
-        tf = body.text_frame
 
-        first = True
-        for line in lines:
-            if first:
-                tf.text = line
-                first = False
-            else:
-                p = tf.add_paragraph()
-                p.text = line
-                p.level = 0
+def build_pptx(project, sections, target=None, template=None):
+    """Write the file to ``target`` (a path or writable binary stream).
+
+    With no target the file is built in memory and returned as bytes.
+    ``template`` names a template registered in app.doc_templates.
+
+    Each slide's shape tree is cached as XML keyed by the section's title
+    and content, so after an edit only the changed slides are rendered again.
+    """
+    prs = new_presentation(template)
+    layout = prs.slide_layouts[1]  # Title + Content
+
+    for sec in sections:
+        key = fragment_key("pptx", template, sec.title, sec.current_content)
+        fragment = get_fragment(key)
+        if fragment is not None:
+            _add_cached_slide(prs, layout, fragment)
+            continue
+
+        slide = prs.slides.add_slide(layout)
+        _render_slide(slide, sec)
+        put_fragment(key, etree.tostring(slide._element.cSld))
+
+    if target is None:
+        buf = io.BytesIO()
+        prs.save(buf)
+        return buf.getvalue()
 
-    prs.save(filepath)
-    return filepath
+    prs.save(target)
+    return target
@@ -1,40 +1,108 @@
-from flask import Blueprint, request, jsonify
+import base64
+from datetime import datetime
+
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, func, insert, or_, update
+from sqlalchemy.orm import load_only
 
 from app import db
+from app.access import owned_project, owned_section
+from app.job_service import active_job_for_project
 from app.models import (
+    GenerationJobSection,
     Project,
     ProjectSection,
     SectionRevision,
     SectionFeedback,
     SectionComment,
 )
+from app.revision_service import get_version_content, revision_page
 
 projects_bp = Blueprint("projects", __name__)
 
 
-def project_to_dict(project):
-    return {
-        "id": project.id,
-        "title": project.title,
-        "doc_type": project.doc_type,
-        "main_topic": project.main_topic,
-        "status": project.status,
-        "created_at": project.created_at.isoformat(),
-        "updated_at": project.updated_at.isoformat() if project.updated_at else None,
-    }
+PROJECT_FIELDS = ("id", "title", "doc_type", "main_topic", "status", "created_at", "updated_at")
+
+
+def project_to_dict(project, fields=PROJECT_FIELDS):
+    data = {}
+    for field in fields:
+        value = getattr(project, field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[field] = value
+    return data
+
+
+def _encode_cursor(project):
+    raw = f"{project.created_at.isoformat()}|{project.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, project_id = raw.split("|")
+    return datetime.fromisoformat(created_at), int(project_id)
 
 
 @projects_bp.route("/projects", methods=["GET"])
 @jwt_required()
 def list_projects():
+    """
+    A page of the user's projects, newest first.
+
+    Query params: cursor (next_cursor of the previous page), limit (max 200),
+    fields=title,status,... (id is always included), include_total=1.
+    """
     user_id = int(get_jwt_identity())
+
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 200)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+
+    fields = PROJECT_FIELDS
+    if request.args.get("fields"):
+        requested = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+        unknown = set(requested) - set(PROJECT_FIELDS)
+        if unknown:
+            return jsonify({"message": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+        fields = ("id",) + tuple(f for f in requested if f != "id")
+
+    # Keyset pagination on (created_at, id): each page is an index range
+    # scan no matter how deep the user pages
+    base = Project.query.filter(Project.user_id == user_id)
+    query = base
+    if request.args.get("cursor"):
+        try:
+            created_at, last_id = _decode_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+        query = query.filter(or_(
+            Project.created_at < created_at,
+            and_(Project.created_at == created_at, Project.id < last_id),
+        ))
+
+    # Only the requested columns (plus the cursor's) are loaded
+    columns = set(fields) | {"id", "created_at"}
     projects = (
-        Project.query.filter_by(user_id=user_id)
-        .order_by(Project.created_at.desc())
+        query.options(load_only(*(getattr(Project, c) for c in columns)))
+        .order_by(Project.created_at.desc(), Project.id.desc())
+        .limit(limit + 1)
         .all()
     )
-    return jsonify([project_to_dict(p) for p in projects])
+    has_more = len(projects) > limit
+    projects = projects[:limit]
+
+    page = {
+        "items": [project_to_dict(p, fields) for p in projects],
+        "has_more": has_more,
+        "next_cursor": _encode_cursor(projects[-1]) if has_more else None,
+    }
+    if request.args.get("include_total") in ("1", "true"):
+        page["total"] = base.with_entities(func.count(Project.id)).scalar()
+    return jsonify(page)
 
 
 @projects_bp.route("/projects", methods=["POST"])
@@ -80,16 +148,24 @@ def create_project():
 @jwt_required()
 def get_project(project_id):
     user_id = int(get_jwt_identity())
-    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Project not found"}), 404
+    project, error = owned_project(project_id, user_id)
+    if error:
+        return error
+
+    # Any section change bumps content_version; project fields bump updated_at
+    updated = project.updated_at.timestamp() if project.updated_at else 0
+    etag = f"{project.id}.{project.content_version}.{updated:.6f}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
 
     sections = (
         ProjectSection.query.filter_by(project_id=project.id)
         .order_by(ProjectSection.index)
         .all()
     )
-    return jsonify(
+    resp = jsonify(
         {
             "project": project_to_dict(project),
             "sections": [
@@ -103,6 +179,10 @@ def get_project(project_id):
             ],
         }
     )
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 
 @projects_bp.route("/projects/<int:project_id>/sections", methods=["POST"])
 @jwt_required()
@@ -110,19 +190,22 @@ def configure_sections(project_id):
     """
     Save the outline/sections for a project.
 
-    ✅ If the incoming structure is IDENTICAL to the existing one
-       (same indexes & titles), we DO NOT touch existing sections,
-       AI content, comments, or feedback.
+    The new outline is diffed against the existing sections. Each incoming
+    section is matched to an existing one by "id" when given, otherwise by
+    an identical title:
+
+       - matched sections keep their content, revisions, comments and
+         feedback; only a changed index or title is updated
+       - existing sections with no match are deleted with their child rows
+       - incoming sections with no match are inserted empty
 
-    ✅ If the structure changed, we:
-       - delete revisions / feedback / comments for old sections
-       - delete the old sections
-       - insert the new sections (fresh, no content, no comments/feedback)
+    Each kind of change is applied as one bulk statement. An identical
+    outline touches nothing.
     """
     user_id = int(get_jwt_identity())
-    project = Project.query.filter_by(id=project_id, user_id=user_id).first()
-    if not project:
-        return jsonify({"message": "Project not found"}), 404
+    project, error = owned_project(project_id, user_id)
+    if error:
+        return error
 
     data = request.get_json() or {}
     sections = data.get("sections") or []
@@ -139,9 +222,10 @@ def configure_sections(project_id):
             continue
         try:
             idx_int = int(idx)
+            section_id = int(s["id"]) if s.get("id") is not None else None
         except (TypeError, ValueError):
-            return jsonify({"message": "Each section index must be an integer"}), 400
-        cleaned.append({"index": idx_int, "title": title})
+            return jsonify({"message": "Each section index and id must be an integer"}), 400
+        cleaned.append({"index": idx_int, "title": title, "id": section_id})
 
     if not cleaned:
         return (
@@ -153,29 +237,53 @@ def configure_sections(project_id):
             400,
         )
 
+    # A generation job holds these sections until it finishes; deleting or
+    # renumbering them underneath it would fail the job
+    job = active_job_for_project(project.id)
+    if job:
+        return jsonify({
+            "message": "Content generation is running; save the outline when it finishes",
+            "job_id": job.id,
+            "status": job.status,
+        }), 409
+
     try:
-        # Existing sections ordered by index
         existing_sections = (
             ProjectSection.query.filter_by(project_id=project.id)
             .order_by(ProjectSection.index)
             .all()
         )
-        existing_normalized = [
-            {"index": s.index, "title": (s.title or "").strip()}
-            for s in existing_sections
-        ]
-        new_normalized = sorted(cleaned, key=lambda x: x["index"])
-
-        # Check if structure actually changed
-        structure_changed = True
-        if len(existing_normalized) == len(new_normalized):
-            if all(
-                e["index"] == n["index"] and e["title"] == n["title"]
-                for e, n in zip(existing_normalized, new_normalized)
-            ):
-                structure_changed = False
-
-        if not structure_changed:
+        new_sections = sorted(cleaned, key=lambda x: x["index"])
+
+        # Match by id first, then by title among the sections still free
+        unmatched = {s.id: s for s in existing_sections}
+        matches = []  # (incoming item, existing section or None)
+        for item in new_sections:
+            matches.append([item, unmatched.pop(item["id"], None)])
+        by_title = {}
+        for sec in existing_sections:
+            if sec.id in unmatched:
+                by_title.setdefault((sec.title or "").strip(), []).append(sec)
+        for match in matches:
+            if match[1] is None and by_title.get(match[0]["title"]):
+                match[1] = by_title[match[0]["title"]].pop(0)
+                del unmatched[match[1].id]
+
+        inserts = []
+        updates = []
+        for item, sec in matches:
+            if sec is None:
+                inserts.append({
+                    "project_id": project.id,
+                    "index": item["index"],
+                    "title": item["title"],
+                    "current_content": None,
+                })
+            elif sec.index != item["index"] or (sec.title or "").strip() != item["title"]:
+                updates.append({"id": sec.id, "index": item["index"], "title": item["title"]})
+        removed_ids = list(unmatched)
+
+        if not inserts and not updates and not removed_ids:
             # Nothing changed → keep everything (content, comments, feedback, revisions)
             project.status = "configured"
             db.session.commit()
@@ -185,40 +293,26 @@ def configure_sections(project_id):
                 }
             ), 200
 
-        # 🚨 Structure changed → reset sections + ALL associated data
-        existing_ids = [s.id for s in existing_sections]
-
-        if existing_ids:
-            # 1) Delete child rows for these sections
-            SectionRevision.query.filter(
-                SectionRevision.section_id.in_(existing_ids)
-            ).delete(synchronize_session=False)
-
-            SectionFeedback.query.filter(
-                SectionFeedback.section_id.in_(existing_ids)
-            ).delete(synchronize_session=False)
-
-            SectionComment.query.filter(
-                SectionComment.section_id.in_(existing_ids)
-            ).delete(synchronize_session=False)
-
-            # 2) Delete the sections themselves
-            ProjectSection.query.filter_by(project_id=project.id).delete(
+        if removed_ids:
+            # Child rows first, then the sections themselves
+            for model in (SectionRevision, SectionFeedback, SectionComment, GenerationJobSection):
+                model.query.filter(model.section_id.in_(removed_ids)).delete(
+                    synchronize_session=False
+                )
+            ProjectSection.query.filter(ProjectSection.id.in_(removed_ids)).delete(
                 synchronize_session=False
             )
-            db.session.flush()
-
-        # 3) Insert new sections (fresh, without content/comments/feedback)
-        for item in new_normalized:
-            sec = ProjectSection(
-                project_id=project.id,
-                index=item["index"],
-                title=item["title"],
-                current_content=None,
-            )
-            db.session.add(sec)
 
-        project.status = "configured"
+        if updates:
+            # Index shifts and renames, by primary key
+            db.session.execute(update(ProjectSection), updates)
+
+        if inserts:
+            db.session.execute(insert(ProjectSection), inserts)
+            # Only the new sections are waiting for generation
+            project.status = "configured"
+
+        project.content_version = Project.content_version + 1
         db.session.commit()
     except Exception as e:
         import traceback
@@ -242,4 +336,53 @@ def configure_sections(project_id):
             500,
         )
 
-    return jsonify({"message": "Sections configured successfully"}), 200
+    return jsonify({
+        "message": "Sections configured successfully",
+        "added": len(inserts),
+        "updated": len(updates),
+        "removed": len(removed_ids),
+    }), 200
+
+
+@projects_bp.route("/sections/<int:section_id>/revisions", methods=["GET"])
+@jwt_required()
+def list_section_revisions(section_id):
+    """
+    Page through a section's history, newest first.
+
+    Query params: before=<version>, limit (max 100), include_content=1.
+    """
+    user_id = int(get_jwt_identity())
+    section, error = owned_section(section_id, user_id)
+    if error:
+        return error
+
+    try:
+        before = request.args.get("before", type=int)
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    include_content = request.args.get("include_content") in ("1", "true")
+
+    page = revision_page(section, before=before, limit=limit, include_content=include_content)
+    page["section_id"] = section.id
+    page["latest_version"] = section.latest_version
+    return jsonify(page)
+
+
+@projects_bp.route("/sections/<int:section_id>/revisions/<int:version>", methods=["GET"])
+@jwt_required()
+def get_section_revision(section_id, version):
+    user_id = int(get_jwt_identity())
+    section, error = owned_section(section_id, user_id)
+    if error:
+        return error
+
+    if version < 1 or version > section.latest_version:
+        return jsonify({"message": "Revision not found"}), 404
+
+    return jsonify({
+        "section_id": section.id,
+        "version": version,
+        "content": get_version_content(section, version),
+    })
@@ -0,0 +1,284 @@
+"""Render .docx/.pptx files in a pool of worker processes.
+
+Building documents is CPU-bound Python, so threads in the web process
+render one file at a time under the GIL and stall every other request
+on that worker. The pool moves renders into RENDER_POOL_PROCESSES
+separate processes. Renders are handed over as plain dicts (no ORM
+objects cross the process boundary) and come back as bytes.
+
+Bulk exports always go through the pool. Single exports do when
+EXPORT_EXECUTION_MODE is "process"; the default "inline" renders in the
+request thread.
+
+The pool is created per web process (it is rebuilt if the process was
+forked after creating it) and uses the "spawn" start method, so workers
+never inherit database connections. With RENDER_POOL_PROCESSES=0
+everything renders inline.
+
+Each render reports its worker's pid when it starts. A render still
+running RENDER_TIMEOUT_SECONDS later fails with RenderTimeout on its own:
+the pool it ran in is retired (new renders go to a fresh pool), and its
+worker is killed once the other renders already in that pool have
+finished or run out of time themselves. Killing a worker any earlier
+would fail every other render in the pool.
+"""
+import contextvars
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Worker -> web process: (task_id, pid, start time) for each render started
+_started_queue = None
+# task_id -> (pid, start time), or None until the report arrives; only
+# renders someone is still waiting for have an entry
+_started = {}
+_started_lock = threading.Lock()
+_task_ids = itertools.count(1)
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class _RenderPool:
+    """A ProcessPoolExecutor plus the futures still outstanding in it."""
+
+    def __init__(self, size, templates):
+        self.executor = ProcessPoolExecutor(
+            max_workers=size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(_started_queue, templates),
+        )
+        self.outstanding = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        with self._lock:
+            self.outstanding.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.outstanding.discard(future)
+
+    def others(self, future):
+        with self._lock:
+            return self.outstanding - {future}
+
+
+def export_record(project, sections):
+    """Plain, picklable copy of what the builders read from a project."""
+    return {
+        "title": project.title,
+        "sections": [
+            {"title": s.title, "current_content": s.current_content} for s in sections
+        ],
+    }
+
+
+def render_document(doc_type, record):
+    """Build one file from an export_record(); runs in a worker process."""
+    project = SimpleNamespace(title=record["title"])
+    sections = [SimpleNamespace(**s) for s in record["sections"]]
+    if doc_type == "pptx":
+        from app.pptx_service import build_pptx
+        return build_pptx(project, sections)
+    from app.docx_service import build_docx
+    return build_docx(project, sections)
+
+
+def _init_worker(started_queue, templates):
+    global _started_queue
+    from app.doc_templates import register_templates
+
+    _started_queue = started_queue
+    # The same templates as the web process (DOCX_TEMPLATES / PPTX_TEMPLATES)
+    register_templates(templates, logging.getLogger(__name__).warning)
+
+
+def _render_task(task_id, doc_type, record):
+    _started_queue.put((task_id, os.getpid(), time.time()))
+    return render_document(doc_type, record)
+
+
+def _warm():
+    return os.getpid()
+
+
+def run_cpu_bound(fn, *args):
+    """Call ``fn(*args)``; in a gevent worker, on gevent's native thread pool.
+
+    Pure-Python work run in a greenlet holds the event loop until it is
+    done. On a real thread the interpreter hands the GIL back to the loop
+    every few milliseconds, so the worker's other requests keep moving.
+    The caller's context (Flask's app context included) goes along.
+    """
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is not None and monkey.is_module_patched("threading"):
+        from gevent import get_hub
+        context = contextvars.copy_context()
+        return get_hub().threadpool.apply(context.run, (fn,) + args)
+    return fn(*args)
+
+
+def _pool_size(app):
+    size = app.config["RENDER_POOL_PROCESSES"]
+    if size is None:
+        return os.cpu_count() or 1
+    return size
+
+
+def _get_render_pool(app):
+    global _pool, _pool_pid, _started_queue
+    if _pool_size(app) <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                # A pool inherited through fork is unusable; start a new one
+                if _pool_pid != os.getpid():
+                    _started_queue = multiprocessing.get_context("spawn").Queue()
+                from app.doc_templates import template_specs
+                _pool = _RenderPool(_pool_size(app), template_specs(app.config))
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_pool(app):
+    render_pool = _get_render_pool(app)
+    return render_pool.executor if render_pool is not None else None
+
+
+def prewarm_pool(app):
+    """Start every worker now so the first exports don't pay for spawning."""
+    pool = get_pool(app)
+    if pool is None:
+        return 0
+    futures = [pool.submit(_warm) for _ in range(_pool_size(app))]
+    return len({f.result() for f in futures})
+
+
+def _discard(render_pool):
+    """Stop handing work to ``render_pool``; renders already in it still finish."""
+    global _pool
+    with _pool_lock:
+        if _pool is render_pool:
+            _pool = None
+    render_pool.executor.shutdown(wait=False)
+
+
+def shutdown_pool():
+    if _pool is not None:
+        _discard(_pool)
+
+
+def _retire(render_pool, future, pid, grace):
+    """Kill the worker stuck on ``future`` without failing the pool's other renders."""
+    _discard(render_pool)
+
+    def reap():
+        wait(render_pool.others(future), timeout=grace)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    threading.Thread(target=reap, name="render-reaper", daemon=True).start()
+
+
+def _drain_started():
+    """Move start reports from the workers into ``_started``.
+
+    Reports for renders nobody waits for any more (they finished before
+    their report came through) are dropped.
+    """
+    with _started_lock:
+        while True:
+            try:
+                task_id, pid, started_at = _started_queue.get_nowait()
+            except queue.Empty:
+                return
+            if task_id in _started:
+                _started[task_id] = (pid, started_at)
+
+
+def render_many(app, tasks):
+    """Render (tag, doc_type, record) tasks; yield (tag, bytes, error) as each finishes.
+
+    A render that runs longer than RENDER_TIMEOUT_SECONDS is yielded with
+    RenderTimeout; the other tasks are not affected.
+    """
+    render_pool = _get_render_pool(app)
+    if render_pool is None:
+        for tag, doc_type, record in tasks:
+            try:
+                yield tag, run_cpu_bound(render_document, doc_type, record), None
+            except Exception as e:
+                yield tag, None, e
+        return
+
+    timeout = app.config["RENDER_TIMEOUT_SECONDS"]
+    poll = min(1.0, timeout)
+    futures = {}
+    for tag, doc_type, record in tasks:
+        task_id = next(_task_ids)
+        with _started_lock:
+            _started[task_id] = None
+        futures[render_pool.submit(_render_task, task_id, doc_type, record)] = (task_id, tag)
+
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+            for future in done:
+                tag = futures[future][1]
+                try:
+                    yield tag, future.result(), None
+                except BrokenProcessPool as e:
+                    # A worker died (OOM, killed); start a fresh pool next time
+                    _discard(render_pool)
+                    yield tag, None, e
+                except Exception as e:
+                    yield tag, None, e
+
+            _drain_started()
+            now = time.time()
+            for future in list(pending):
+                task_id, tag = futures[future]
+                with _started_lock:
+                    started = _started.get(task_id)
+                if started is None or now - started[1] < timeout:
+                    continue
+                pending.discard(future)
+                _retire(render_pool, future, started[0], timeout)
+                yield tag, None, RenderTimeout(f"render did not finish within {timeout}s")
+    finally:
+        for future in futures:
+            future.cancel()
+        _drain_started()
+        with _started_lock:
+            for task_id, _ in futures.values():
+                _started.pop(task_id, None)
+
+
+def render_one(app, doc_type, record):
+    """Render a single file in the pool (or inline); raises on failure."""
+    for _, data, error in render_many(app, [(None, doc_type, record)]):
+        if error is not None:
+            raise error
+        return data
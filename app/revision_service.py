@@ -0,0 +1,305 @@
+import functools
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from flask import current_app
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.models import Project, ProjectSection, SectionRevision
+from app.render_pool import run_cpu_bound
+
+# Words and the whitespace between them; joining the tokens gives back the
+# original text exactly.
+_TOKEN_RE = re.compile(r"\s+|\S+")
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text or "")
+
+
+def _compress(obj):
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def encode_revision(version, old_text, new_text):
+    """Return (is_snapshot, payload) for storing ``new_text``.
+
+    Version 1, every REVISION_SNAPSHOT_INTERVAL-th version, and any version
+    whose delta would not be smaller than the full text are stored as
+    snapshots. The rest are word-level deltas against ``old_text`` (the
+    previous version), as a list of ["=", start, end] token ranges to copy
+    and ["+", text] insertions.
+    """
+    snapshot = _compress(new_text)
+    interval = current_app.config["REVISION_SNAPSHOT_INTERVAL"]
+    if old_text is None or version == 1 or (version - 1) % interval == 0:
+        return True, snapshot
+
+    old_tokens = _tokens(old_text)
+    new_tokens = _tokens(new_text)
+    ops = []
+    matcher = SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", "".join(new_tokens[j1:j2])])
+
+    delta = _compress(ops)
+    if len(delta) >= len(snapshot):
+        return True, snapshot
+    return False, delta
+
+
+def _decode(rev, previous_text):
+    if rev.payload is None:
+        # Row written before delta storage (not yet compacted)
+        return rev.new_content
+    if rev.is_snapshot:
+        return _decompress(rev.payload)
+
+    old_tokens = _tokens(previous_text)
+    out = []
+    for op in _decompress(rev.payload):
+        if op[0] == "=":
+            out.extend(old_tokens[op[1]:op[2]])
+        else:
+            out.append(op[1])
+    return "".join(out)
+
+
+def _reserve_versions(section_ids):
+    """Atomically bump latest_version for the given sections.
+
+    One UPDATE for all of them; the row locks it takes make concurrent
+    refines of the same section queue up instead of picking the same
+    version. Returns {section_id: (new version, current_content)}, the
+    content being the text of the previous version as read under the lock
+    (the caller's loaded row may be older if another refine committed
+    while the model was running).
+    """
+    stmt = (
+        update(ProjectSection)
+        .where(ProjectSection.id.in_(section_ids))
+        .values(latest_version=ProjectSection.latest_version + 1)
+    )
+    opts = {"synchronize_session": False}
+
+    if db.engine.dialect.update_returning:
+        rows = db.session.execute(
+            stmt.returning(
+                ProjectSection.id, ProjectSection.latest_version, ProjectSection.current_content
+            ),
+            execution_options=opts,
+        ).all()
+    else:
+        db.session.execute(stmt, execution_options=opts)
+        rows = db.session.execute(
+            select(
+                ProjectSection.id, ProjectSection.latest_version, ProjectSection.current_content
+            )
+            .where(ProjectSection.id.in_(section_ids))
+            .with_for_update()
+        ).all()
+    return {section_id: (version, content) for section_id, version, content in rows}
+
+
+def bump_content_versions(project_ids):
+    """Mark projects as changed so cached copies (ETags) are invalidated."""
+    db.session.execute(
+        update(Project)
+        .where(Project.id.in_(set(project_ids)))
+        .values(content_version=Project.content_version + 1),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def record_revisions(changes):
+    """Apply new content to several sections with a single bulk insert.
+
+    ``changes`` is a list of (section, new_text, prompt). ``prompt`` is the
+    user's refinement request; leave it as None for AI generation passes,
+    which are labelled "initial generation"/"regenerate".
+    Returns {section_id: new version}; sections deleted since the caller
+    loaded them are skipped and left out. The caller commits.
+    """
+    if not changes:
+        return {}
+
+    reserved = _reserve_versions([section.id for section, _, _ in changes])
+    versions = {section_id: version for section_id, (version, _) in reserved.items()}
+
+    # Under gevent the deltas are computed on a native thread while this
+    # transaction holds its row locks. Not on SQLite: a greenlet waiting on
+    # SQLite's write lock blocks the whole worker, including the greenlet
+    # that holds it.
+    encode = encode_revision
+    if db.engine.dialect.name != "sqlite":
+        encode = functools.partial(run_cpu_bound, encode_revision)
+
+    rows = []
+    for section, new_text, prompt in changes:
+        if section.id not in reserved:
+            continue  # deleted (outline saved) while the model was running
+        version, previous_text = reserved[section.id]
+        if prompt is None:
+            prompt = "initial generation" if version == 1 else "regenerate"
+        # Delta against the stored text of version - 1, not the caller's copy
+        is_snapshot, payload = encode(version, previous_text, new_text)
+        rows.append({
+            "section_id": section.id,
+            "version": version,
+            "prompt": prompt,
+            "is_snapshot": is_snapshot,
+            "payload": payload,
+        })
+        section.current_content = new_text
+        set_committed_value(section, "latest_version", version)
+
+    if rows:
+        db.session.execute(insert(SectionRevision), rows)
+        bump_content_versions(
+            section.project_id for section, _, _ in changes if section.id in reserved
+        )
+    return versions
+
+
+def record_revision(section, new_text, prompt=None):
+    """Single-section form of record_revisions.
+
+    Returns the new version, or None if the section was deleted meanwhile.
+    """
+    return record_revisions([(section, new_text, prompt)]).get(section.id)
+
+
+def reconstruct_versions(section_id, low, high):
+    """Return {version: content} for low <= version <= high.
+
+    Loads the rows from the nearest snapshot at or below ``low`` up to
+    ``high`` in one query and replays the deltas forward.
+    """
+    base = (
+        db.session.query(func.max(SectionRevision.version))
+        .filter(
+            SectionRevision.section_id == section_id,
+            SectionRevision.version <= low,
+            or_(SectionRevision.is_snapshot.is_(True), SectionRevision.payload.is_(None)),
+        )
+        .scalar()
+    )
+    rows = (
+        SectionRevision.query
+        .filter(
+            SectionRevision.section_id == section_id,
+            SectionRevision.version >= (base or 1),
+            SectionRevision.version <= high,
+        )
+        .order_by(SectionRevision.version)
+        .all()
+    )
+
+    result = {}
+    text = None
+    for rev in rows:
+        text = _decode(rev, text)
+        if rev.version >= low:
+            result[rev.version] = text
+    return result
+
+
+def get_version_content(section, version):
+    """Content of one version; the latest is read straight off the section."""
+    if version == section.latest_version:
+        return section.current_content
+    return reconstruct_versions(section.id, version, version).get(version)
+
+
+def revision_page(section, before=None, limit=20, include_content=False):
+    """Newest-first page of a section's history, starting below ``before``."""
+    query = SectionRevision.query.filter_by(section_id=section.id)
+    if before is not None:
+        query = query.filter(SectionRevision.version < before)
+    # Only metadata columns; payloads are loaded only when content is asked for
+    revs = (
+        query.with_entities(
+            SectionRevision.version,
+            SectionRevision.prompt,
+            SectionRevision.is_snapshot,
+            SectionRevision.created_at,
+        )
+        .order_by(SectionRevision.version.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(revs) > limit
+    revs = revs[:limit]
+
+    contents = {}
+    if include_content and revs:
+        contents = reconstruct_versions(section.id, revs[-1].version, revs[0].version)
+
+    items = []
+    for rev in revs:
+        item = {
+            "version": rev.version,
+            "prompt": rev.prompt,
+            "is_snapshot": bool(rev.is_snapshot),
+            "created_at": rev.created_at.isoformat() if rev.created_at else None,
+        }
+        if include_content:
+            item["content"] = contents.get(rev.version)
+        items.append(item)
+
+    return {
+        "items": items,
+        "has_more": has_more,
+        "next_before": revs[-1].version if has_more else None,
+    }
+
+
+def compact_revisions(batch_size=200, log=print):
+    """One-off migration: re-encode full-text revision rows as snapshots/deltas.
+
+    Works section by section and commits after each batch of sections, so it
+    can be interrupted and re-run.
+    """
+    converted = 0
+    while True:
+        section_ids = (
+            db.session.query(SectionRevision.section_id)
+            .filter(SectionRevision.payload.is_(None))
+            .distinct()
+            .limit(batch_size)
+            .all()
+        )
+        if not section_ids:
+            break
+
+        for (section_id,) in section_ids:
+            revs = (
+                SectionRevision.query
+                .filter_by(section_id=section_id)
+                .order_by(SectionRevision.version)
+                .all()
+            )
+            previous = None
+            for rev in revs:
+                text = _decode(rev, previous)
+                if rev.payload is None:
+                    rev.is_snapshot, rev.payload = encode_revision(rev.version, previous, text)
+                    rev.old_content = None
+                    rev.new_content = None
+                    converted += 1
+                previous = text
+        db.session.commit()
+        log(f"Compacted {converted} revisions so far")
+
+    return converted
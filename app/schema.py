@@ -0,0 +1,227 @@
+"""In-place upgrades for databases created before a schema change.
+
+``db.create_all()`` only creates missing tables; it never adds columns or
+indexes to tables that already exist. ``upgrade_schema`` fills that gap.
+Every step checks the live schema first, so re-running it is a no-op.
+
+None of this runs when the app starts: ``python run.py upgrade-db`` (the
+Procfile release step) calls ``upgrade_database`` once per deploy, so web
+workers, job workers and render processes never race each other on DDL.
+"""
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from app import db
+
+
+def _columns(inspector, table):
+    return {c["name"] for c in inspector.get_columns(table)}
+
+
+def _indexes(inspector, table):
+    return {i["name"] for i in inspector.get_indexes(table)}
+
+
+def _add_section_latest_version(inspector):
+    if "latest_version" in _columns(inspector, "project_sections"):
+        return
+
+    current_app.logger.info("Schema upgrade: adding project_sections.latest_version")
+    db.session.execute(text(
+        "ALTER TABLE project_sections "
+        "ADD COLUMN latest_version INTEGER NOT NULL DEFAULT 0"
+    ))
+    db.session.execute(text(
+        "UPDATE project_sections SET latest_version = COALESCE("
+        "(SELECT MAX(version) FROM section_revisions "
+        "WHERE section_revisions.section_id = project_sections.id), 0)"
+    ))
+
+
+def _add_revision_version_unique(inspector):
+    if "uq_section_revisions_section_version" in _indexes(inspector, "section_revisions"):
+        return
+
+    current_app.logger.info("Schema upgrade: adding unique (section_id, version)")
+    # Concurrent refines could produce duplicate versions before the
+    # constraint existed; renumber those sections in creation order first.
+    dupes = db.session.execute(text(
+        "SELECT DISTINCT section_id FROM section_revisions "
+        "GROUP BY section_id, version HAVING COUNT(*) > 1"
+    )).scalars().all()
+    for section_id in dupes:
+        rev_ids = db.session.execute(text(
+            "SELECT id FROM section_revisions WHERE section_id = :sid "
+            "ORDER BY created_at, id"
+        ), {"sid": section_id}).scalars().all()
+        # Move out of the way first so the renumbering cannot collide
+        db.session.execute(text(
+            "UPDATE section_revisions SET version = -id WHERE section_id = :sid"
+        ), {"sid": section_id})
+        for version, rev_id in enumerate(rev_ids, start=1):
+            db.session.execute(text(
+                "UPDATE section_revisions SET version = :v WHERE id = :id"
+            ), {"v": version, "id": rev_id})
+        db.session.execute(text(
+            "UPDATE project_sections SET latest_version = :v WHERE id = :sid"
+        ), {"v": len(rev_ids), "sid": section_id})
+
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX uq_section_revisions_section_version "
+        "ON section_revisions (section_id, version)"
+    ))
+
+
+def _add_revision_payload(inspector):
+    columns = _columns(inspector, "section_revisions")
+    if "is_snapshot" not in columns:
+        current_app.logger.info("Schema upgrade: adding section_revisions.is_snapshot")
+        db.session.execute(text(
+            "ALTER TABLE section_revisions "
+            "ADD COLUMN is_snapshot BOOLEAN NOT NULL DEFAULT FALSE"
+        ))
+    if "payload" not in columns:
+        current_app.logger.info("Schema upgrade: adding section_revisions.payload")
+        blob = db.LargeBinary().compile(dialect=db.engine.dialect)
+        db.session.execute(text(
+            f"ALTER TABLE section_revisions ADD COLUMN payload {blob}"
+        ))
+
+
+def _rebuild_sqlite_table(inspector, table_name):
+    """SQLite cannot ALTER a column; copy the table into the model's shape."""
+    table = db.metadata.tables[table_name]
+    keep = [c.name for c in table.columns if c.name in _columns(inspector, table_name)]
+    cols = ", ".join(f'"{c}"' for c in keep)
+
+    for name in _indexes(inspector, table_name):
+        db.session.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+    db.session.execute(text(f'ALTER TABLE {table_name} RENAME TO {table_name}__old'))
+    table.create(bind=db.session.connection())
+    db.session.execute(text(
+        f"INSERT INTO {table_name} ({cols}) SELECT {cols} FROM {table_name}__old"
+    ))
+    db.session.execute(text(f"DROP TABLE {table_name}__old"))
+
+
+def _relax_revision_new_content(inspector):
+    column = next(
+        c for c in inspector.get_columns("section_revisions") if c["name"] == "new_content"
+    )
+    if column["nullable"]:
+        return
+
+    current_app.logger.info("Schema upgrade: making section_revisions.new_content nullable")
+    if db.engine.dialect.name == "sqlite":
+        _rebuild_sqlite_table(inspector, "section_revisions")
+    else:
+        db.session.execute(text(
+            "ALTER TABLE section_revisions ALTER COLUMN new_content DROP NOT NULL"
+        ))
+
+
+def _add_project_content_version(inspector):
+    if "content_version" in _columns(inspector, "projects"):
+        return
+
+    current_app.logger.info("Schema upgrade: adding projects.content_version")
+    db.session.execute(text(
+        "ALTER TABLE projects ADD COLUMN content_version INTEGER NOT NULL DEFAULT 0"
+    ))
+
+
+def _invalid_postgres_indexes():
+    """Names of indexes Postgres marks invalid.
+
+    A CREATE INDEX CONCURRENTLY that failed or was interrupted leaves one
+    behind under the intended name; the planner never uses it.
+    """
+    rows = db.session.execute(text(
+        "SELECT c.relname FROM pg_index i "
+        "JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE NOT i.indisvalid AND n.nspname = current_schema()"
+    ))
+    return {name for (name,) in rows}
+
+
+def _add_missing_indexes(inspector):
+    """Create any index declared in app.models that the database lacks.
+
+    On Postgres the indexes are built CONCURRENTLY (outside the upgrade
+    transaction) so large tables stay writable while they build, and
+    invalid leftovers of an earlier failed build are dropped and rebuilt.
+    """
+    postgres = db.engine.dialect.name == "postgresql"
+    invalid = _invalid_postgres_indexes() if postgres else set()
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = _indexes(inspector, table.name) - invalid
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            if index.name in present:
+                continue
+            if not postgres:
+                current_app.logger.info("Schema upgrade: creating index %s", index.name)
+                index.create(bind=db.session.connection())
+                continue
+
+            statements = []
+            if index.name in invalid:
+                current_app.logger.warning(
+                    "Schema upgrade: rebuilding invalid index %s", index.name
+                )
+                statements.append(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"')
+            else:
+                current_app.logger.info("Schema upgrade: creating index %s", index.name)
+            ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect))
+            statements.append(ddl.replace("INDEX", "INDEX CONCURRENTLY IF NOT EXISTS", 1))
+            with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+
+
+UPGRADES = [
+    _add_section_latest_version,
+    _add_revision_version_unique,
+    _add_revision_payload,
+    _relax_revision_new_content,
+    _add_project_content_version,
+    # Last: relies on the earlier steps (e.g. de-duplicated revision versions)
+    _add_missing_indexes,
+]
+
+
+def upgrade_schema():
+    for step in UPGRADES:
+        step(inspect(db.engine))
+        db.session.commit()
+
+
+# Arbitrary key for pg_advisory_lock, shared by every upgrade-db run
+_UPGRADE_LOCK_KEY = 7305842113
+
+
+@contextmanager
+def _upgrade_lock():
+    """Serialize concurrent upgrade runs (e.g. two deploys) on Postgres."""
+    if db.engine.dialect.name != "postgresql":
+        yield
+        return
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _UPGRADE_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _UPGRADE_LOCK_KEY})
+
+
+def upgrade_database():
+    """Create missing tables and apply in-place upgrades. Needs an app context."""
+    with _upgrade_lock():
+        db.create_all()
+        upgrade_schema()
@@ -0,0 +1,61 @@
+"""In-process request coalescing.
+
+``SingleFlight.do(key, fn)`` runs ``fn`` once for all callers that ask for
+the same key at the same time: the first caller runs it, the others wait
+and get the same result (or exception). Used to fold double-clicked
+generate/refine requests into one model call and one revision.
+
+Only requests handled by the same worker process are coalesced; retries
+that land on another worker are covered by Idempotency-Key (app.idempotency).
+"""
+import threading
+
+_groups = []
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls = {}
+        _groups.append(self)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def coalesced_counts():
+    return {group.name: group.coalesced for group in _groups}
@@ -0,0 +1,129 @@
+"""In-flight AI requests per gunicorn worker class.
+
+Seeds a SQLite database, starts gunicorn with gunicorn.conf.py (fake LLM
+backend with a fixed latency), fires N refine requests at once and reports
+how many model calls were in flight on average:
+
+    in flight = requests * model latency / wall time
+
+With sync workers that number can't exceed the worker count; with gevent
+workers it should approach the number of requests.
+
+    python benchmarks/bench_concurrency.py --worker-class sync --requests 20
+    python benchmarks/bench_concurrency.py --worker-class gevent --requests 200
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from load_test import Client, percentile, seed  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(base_url, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("gunicorn exited during startup")
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise SystemExit("gunicorn did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worker-class", choices=["sync", "gevent"], default="gevent")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=2000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="smartdoc-concurrency-"), "bench.db"
+    )
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_JITTER_MS"] = "0"
+    os.environ["AI_CACHE_ENABLED"] = "false"
+    os.environ["JOB_EXECUTION_MODE"] = "worker"
+
+    from app import create_app
+    from app.schema import upgrade_database
+
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+    seed_args = argparse.Namespace(
+        users=1, projects_per_user=max(1, args.requests // 10), sections=10,
+        comments_per_section=0,
+    )
+    account = seed(app, seed_args)[0]
+    sections = [sid for sids in account["projects"].values() for sid in sids]
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_WORKER_CLASS=args.worker_class,
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "run:app"],
+        cwd=ROOT, env=env, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_up(base_url, proc)
+        client = Client(base_url)
+        status, body, _, _ = client.request("POST", "/auth/login", payload={
+            "email": account["email"], "password": account["password"],
+        })
+        token = json.loads(body)["access_token"]
+
+        def one(i):
+            return client.request(
+                "POST", f"/api/sections/{sections[i % len(sections)]}/refine", token,
+                {"prompt": f"variant {i}", "use_cache": False},
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.requests) as pool:
+            results = list(pool.map(one, range(args.requests)))
+        wall = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    latencies = sorted(r[2] * 1000 for r in results)
+    errors = sum(1 for r in results if r[0] >= 400)
+    in_flight = args.requests * args.latency_ms / 1000 / wall
+    print(f"worker class       {args.worker_class} x {args.workers}")
+    print(f"requests           {args.requests} ({errors} errors)")
+    print(f"model latency      {args.latency_ms:.0f} ms")
+    print(f"wall time          {wall:.2f} s")
+    print(f"latency p50/p99    {percentile(latencies, 50):.0f} / {percentile(latencies, 99):.0f} ms")
+    print(f"avg in flight      {in_flight:.1f}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
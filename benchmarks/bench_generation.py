@@ -0,0 +1,94 @@
+"""Compare per-section and batched outline generation.
+
+Runs both paths of app.ai_service against the offline fake backend with a
+simple latency model (round-trip + time per 1k characters sent and
+received) and reports model calls, prompt characters and wall time.
+
+    python benchmarks/bench_generation.py --sections 20 --rtt-ms 800
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import ai_service  # noqa: E402
+from app.llm_backends import FakeBackend, set_backend  # noqa: E402
+
+
+class CountingBackend(FakeBackend):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.prompt_chars = 0
+        self._count_lock = threading.Lock()
+
+    def generate(self, model, prompt, params=None):
+        with self._count_lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+        return super().generate(model, prompt, params)
+
+
+def run(label, fn, backend):
+    backend.calls = backend.prompt_chars = 0
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": label,
+        "calls": backend.calls,
+        "prompt_chars": backend.prompt_chars,
+        "wall_s": round(elapsed, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rtt-ms", type=float, default=800)
+    parser.add_argument("--ms-per-kchar", type=float, default=40)
+    parser.add_argument("--words", type=int, default=60)
+    args = parser.parse_args()
+
+    backend = CountingBackend(
+        latency_ms=args.rtt_ms,
+        distribution="fixed",
+        ms_per_kchar=args.ms_per_kchar,
+        output_words=args.words,
+    )
+    set_backend(backend)
+
+    project = SimpleNamespace(
+        id=1,
+        doc_type="pptx",
+        main_topic="Quarterly business review for a mid-size logistics company " * 4,
+    )
+    sections = [
+        SimpleNamespace(id=i, index=i, title=f"Slide {i}", current_content=None)
+        for i in range(1, args.sections + 1)
+    ]
+
+    def per_section():
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(
+                lambda s: ai_service.generate_section_content(project, s, use_cache=False),
+                sections,
+            ))
+
+    def batched():
+        answered = ai_service.generate_outline_content(project, sections, use_cache=False)
+        assert len(answered) == len(sections)
+
+    results = [run("per-section", per_section, backend), run("batch", batched, backend)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
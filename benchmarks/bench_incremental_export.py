@@ -0,0 +1,62 @@
+"""Export time after editing a few sections of a large document.
+
+Renders a document once to fill the per-section fragment cache, then
+changes N sections and renders again, for several N. With the cache,
+the second render should grow with N rather than with the document size.
+
+    python benchmarks/bench_incremental_export.py --sections 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import export_cache  # noqa: E402
+from app.docx_service import build_docx  # noqa: E402
+from app.pptx_service import build_pptx  # noqa: E402
+
+
+def make_sections(n):
+    return [
+        SimpleNamespace(
+            title=f"Section {i}",
+            current_content="\n".join(f"Point {j} of section {i}, with a few more words." for j in range(8)),
+        )
+        for i in range(1, n + 1)
+    ]
+
+
+def timed(build, project, sections):
+    start = time.perf_counter()
+    build(project, sections)
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=50)
+    parser.add_argument("--changed", default="0,1,5,25")
+    args = parser.parse_args()
+
+    project = SimpleNamespace(title="Incremental export benchmark")
+    results = []
+    for label, build in (("docx", build_docx), ("pptx", build_pptx)):
+        build(project, make_sections(1))  # load templates and imports
+        row = {"doc_type": label}
+        for changed in [int(n) for n in args.changed.split(",")]:
+            export_cache._fragments = export_cache.ArtifactCache()
+            sections = make_sections(args.sections)
+            row["full_render_ms"] = timed(build, project, sections)
+            for sec in sections[:changed]:
+                sec.current_content += "\nEdited."
+            row[f"{changed}_changed_ms"] = timed(build, project, sections)
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
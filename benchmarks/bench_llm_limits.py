@@ -0,0 +1,121 @@
+"""Model calls against a provider quota, with and without app.llm_limits.
+
+The fake backend answers 429 once more than --quota-rps calls started in
+the last second, like Gemini's per-minute quota on a smaller scale. The
+same burst of per-section generations is run with retries/AIMD turned
+off (one attempt), on, and on with a token bucket matching the quota.
+Reports how many sections succeeded, how many 429s the provider saw and
+the wall time.
+
+    python benchmarks/bench_llm_limits.py --sections 200 --concurrency 32 --quota-rps 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import ai_service, llm_limits  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.llm_backends import FakeBackend, LLMBackendError, set_backend  # noqa: E402
+
+
+class QuotaBackend(FakeBackend):
+    def __init__(self, quota_rps, **kwargs):
+        super().__init__(**kwargs)
+        self.quota_rps = quota_rps
+        self.rejected = 0
+        self._starts = deque()
+        self._quota_lock = threading.Lock()
+
+    def generate(self, model, prompt, params=None):
+        with self._quota_lock:
+            now = time.monotonic()
+            while self._starts and self._starts[0] < now - 1:
+                self._starts.popleft()
+            over = len(self._starts) >= self.quota_rps
+            if over:
+                self.rejected += 1
+            else:
+                self._starts.append(now)
+        if over:
+            time.sleep(0.05)
+            raise LLMBackendError("429 RESOURCE_EXHAUSTED", 429)
+        return super().generate(model, prompt, params)
+
+
+def run(label, backend, project, sections, concurrency):
+    backend.rejected = 0
+    retries_before = sum(llm_limits.limiter_state()[1].values())
+    failed = []
+
+    def one(sec):
+        try:
+            ai_service.generate_section_content(project, sec, use_cache=False)
+        except Exception as e:
+            failed.append(str(e))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, sections))
+    elapsed = time.perf_counter() - start
+    counts, retries = llm_limits.limiter_state()
+    return {
+        "mode": label,
+        "succeeded": len(sections) - len(failed),
+        "failed": len(failed),
+        "provider_429s": backend.rejected,
+        "retries": sum(retries.values()) - retries_before,
+        "concurrency_limit": round(counts.get("concurrency_limit", 0), 2),
+        "wall_s": round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--quota-rps", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--deadline", type=float, default=60)
+    args = parser.parse_args()
+
+    backend = QuotaBackend(
+        args.quota_rps, latency_ms=args.latency_ms, distribution="fixed", output_words=40,
+    )
+    set_backend(backend)
+    project = SimpleNamespace(id=1, doc_type="docx", main_topic="Quota behaviour")
+    sections = [
+        SimpleNamespace(id=i, index=i, title=f"Section {i}", current_content=None)
+        for i in range(1, args.sections + 1)
+    ]
+
+    # Settings are read from Config outside an app context; get_guard()
+    # builds a fresh guard whenever they change.
+    Config.LLM_RATE_LIMIT_PER_MINUTE = 0
+    Config.LLM_CONCURRENCY_MAX = args.concurrency
+    Config.LLM_RETRY_DEADLINE_SECONDS = args.deadline
+
+    Config.LLM_RETRY_MAX_ATTEMPTS = 1
+    Config.LLM_CONCURRENCY_MIN = args.concurrency  # fixed limit, no AIMD
+    results = [run("no retries", backend, project, sections, args.concurrency)]
+
+    Config.LLM_RETRY_MAX_ATTEMPTS = 6
+    Config.LLM_CONCURRENCY_MIN = 1
+    results.append(run("retries + AIMD", backend, project, sections, args.concurrency))
+
+    Config.LLM_RATE_LIMIT_PER_MINUTE = args.quota_rps * 60
+    Config.LLM_RATE_LIMIT_BURST = args.quota_rps
+    results.append(run("+ token bucket", backend, project, sections, args.concurrency))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Fixed per-export cost of the docx/pptx builders.
+
+Builds a one-section export repeatedly (with the per-section fragment
+cache turned off), once starting each file from the
+library's bundled template (``Document()`` / ``Presentation()``, parsed
+from scratch every time) and once from the preloaded template in
+app.doc_templates, and reports milliseconds per export.
+
+    python benchmarks/bench_templates.py --iterations 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from docx import Document  # noqa: E402
+from pptx import Presentation  # noqa: E402
+
+from app import docx_service, pptx_service  # noqa: E402
+from app.doc_templates import register_template  # noqa: E402
+
+
+def per_export_ms(build, project, sections, iterations):
+    build(project, sections)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build(project, sections)
+    return round((time.perf_counter() - start) / iterations * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=1)
+    args = parser.parse_args()
+
+    project = SimpleNamespace(title="Template benchmark")
+    sections = [
+        SimpleNamespace(title=f"Section {i}", current_content="A short paragraph.\n\nAnother one.")
+        for i in range(1, args.sections + 1)
+    ]
+
+    register_template("docx", "default")
+    register_template("pptx", "default")
+
+    results = []
+    for label, service, attr, fresh in (
+        ("docx", docx_service, "new_document", Document),
+        ("pptx", pptx_service, "new_presentation", Presentation),
+    ):
+        build = getattr(service, "build_" + label)
+        with mock.patch.object(service, "get_fragment", lambda key: None):
+            with mock.patch.object(service, attr, lambda template=None, fresh=fresh: fresh()):
+                before = per_export_ms(build, project, sections, args.iterations)
+            after = per_export_ms(build, project, sections, args.iterations)
+        results.append({
+            "doc_type": label,
+            "parse_per_export_ms": before,
+            "preloaded_ms": after,
+            "speedup": round(before / after, 2),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""HTTP load and latency benchmark for the API.
+
+Boots create_app() on a local threaded server against SQLite (default) or
+any DATABASE_URL, with the offline fake LLM backend, seeds users, projects
+and sections, then drives the real endpoints at a fixed concurrency.
+
+With --background-exports N, N threads keep requesting uncached exports
+for the whole run, to show how heavy renders affect the other endpoints
+(compare --export-mode inline against process).
+
+Reports p50/p95/p99 latency, throughput and SQL queries per request for
+every endpoint, and writes everything to a JSON file so runs from
+different commits can be compared:
+
+    python benchmarks/load_test.py --output before.json
+    python benchmarks/load_test.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+ENDPOINTS = [
+    "login",
+    "list_projects",
+    "get_project",
+    "get_comments",
+    "add_comment",
+    "add_feedback",
+    "refine",
+    "generate",
+    "export_docx",
+    "export_pptx",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="defaults to a fresh SQLite file")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--projects-per-user", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--comments-per-section", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per endpoint")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--fake-latency-ms", type=float, default=50)
+    parser.add_argument("--run-jobs", action="store_true",
+                        help="run generation jobs in-process while measuring")
+    parser.add_argument("--background-exports", type=int, default=0,
+                        help="threads running uncached exports during the run")
+    parser.add_argument("--export-mode", choices=["inline", "process"], default="inline")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    return parser.parse_args()
+
+
+def configure_env(args):
+    db_url = args.db_url or "sqlite:///" + os.path.join(
+        tempfile.mkdtemp(prefix="smartdoc-bench-"), "bench.db"
+    )
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.fake_latency_ms)
+    os.environ["FAKE_LLM_LATENCY_JITTER_MS"] = str(args.fake_latency_ms / 4)
+    os.environ["FAKE_LLM_SEED"] = "1"
+    os.environ["AI_CACHE_ENABLED"] = "false"
+    os.environ["JOB_EXECUTION_MODE"] = "thread" if args.run_jobs else "worker"
+    os.environ["EXPORT_EXECUTION_MODE"] = args.export_mode
+    if args.background_exports:
+        # Every background export must really render
+        os.environ["EXPORT_CACHE_MAX_BYTES"] = "0"
+    return db_url
+
+
+def install_query_counter(app):
+    """Count SQL statements per request and report them in a response header."""
+    from sqlalchemy import event
+
+    from app import db
+
+    local = threading.local()
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        local.count = getattr(local, "count", 0) + 1
+
+    @app.before_request
+    def _reset():
+        local.count = 0
+
+    @app.after_request
+    def _report(response):
+        response.headers["X-Bench-Queries"] = str(getattr(local, "count", 0))
+        return response
+
+
+def seed(app, args):
+    from werkzeug.security import generate_password_hash
+    from sqlalchemy import insert
+
+    from app import db
+    from app.models import Project, ProjectSection, SectionComment, User
+
+    password = "bench-password"
+    # Hashing is deliberately slow; every bench user shares one hash
+    pw_hash = generate_password_hash(password)
+    body = ("Seeded paragraph of section content for load testing. " * 8).strip()
+
+    with app.app_context():
+        users = []
+        for u in range(args.users):
+            user = User(email=f"bench{u}@example.com", password_hash=pw_hash)
+            db.session.add(user)
+            users.append(user)
+        db.session.flush()
+
+        projects = []
+        for user in users:
+            for p in range(args.projects_per_user):
+                project = Project(
+                    user_id=user.id,
+                    title=f"Bench project {p}",
+                    doc_type="docx" if p % 2 else "pptx",
+                    main_topic="Load testing the document generator",
+                    status="generated",
+                )
+                db.session.add(project)
+                projects.append(project)
+        db.session.flush()
+
+        db.session.execute(insert(ProjectSection), [
+            {
+                "project_id": project.id,
+                "index": i,
+                "title": f"Section {i}",
+                "current_content": body,
+            }
+            for project in projects
+            for i in range(1, args.sections + 1)
+        ])
+        db.session.flush()
+
+        sections = db.session.query(ProjectSection.id, ProjectSection.project_id).all()
+        if args.comments_per_section:
+            db.session.execute(insert(SectionComment), [
+                {"section_id": sid, "comment": f"Seed comment {c}"}
+                for sid, _ in sections
+                for c in range(args.comments_per_section)
+            ])
+        db.session.commit()
+
+        owner = {p.id: p.user_id for p in projects}
+        targets = {}
+        for sid, pid in sections:
+            targets.setdefault(owner[pid], {}).setdefault(pid, []).append(sid)
+
+        return [
+            {
+                "email": user.email,
+                "password": password,
+                "projects": targets.get(user.id, {}),
+            }
+            for user in users
+        ]
+
+
+class Client:
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, token=None, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", "Bearer " + token)
+
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                body = resp.read()
+                status = resp.status
+                queries = resp.headers.get("X-Bench-Queries")
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+            queries = e.headers.get("X-Bench-Queries")
+        elapsed = time.perf_counter() - start
+        return status, body, elapsed, int(queries) if queries else None
+
+
+def build_scenarios(accounts):
+    """Map endpoint name -> function(i) returning (method, path, token, payload)."""
+
+    def pick(i):
+        account = accounts[i % len(accounts)]
+        project_ids = sorted(account["projects"])
+        pid = project_ids[i % len(project_ids)]
+        sections = account["projects"][pid]
+        return account, pid, sections[i % len(sections)]
+
+    def login(i):
+        account = accounts[i % len(accounts)]
+        return "POST", "/auth/login", None, {
+            "email": account["email"], "password": account["password"],
+        }
+
+    def simple(method, path_fmt, payload=None):
+        def scenario(i):
+            account, pid, sid = pick(i)
+            return method, path_fmt.format(pid=pid, sid=sid), account["token"], payload
+        return scenario
+
+    return {
+        "login": login,
+        "list_projects": simple("GET", "/api/projects"),
+        "get_project": simple("GET", "/api/projects/{pid}"),
+        "get_comments": simple("GET", "/api/projects/{pid}/comments"),
+        "add_comment": simple("POST", "/api/sections/{sid}/comments", {"comment": "bench"}),
+        "add_feedback": simple("POST", "/api/sections/{sid}/feedback", {"is_like": True}),
+        "refine": simple("POST", "/api/sections/{sid}/refine", {"prompt": "shorter", "use_cache": False}),
+        "generate": simple("POST", "/api/projects/{pid}/generate", {"use_cache": False}),
+        "export_docx": simple("GET", "/api/projects/{pid}/export/docx"),
+        "export_pptx": simple("GET", "/api/projects/{pid}/export/pptx"),
+    }
+
+
+def start_background_exports(client, accounts, threads):
+    stop = threading.Event()
+    done = [0]
+
+    def loop(n):
+        account = accounts[n % len(accounts)]
+        project_ids = sorted(account["projects"])
+        i = 0
+        while not stop.is_set():
+            pid = project_ids[i % len(project_ids)]
+            kind = "pptx" if i % 2 else "docx"
+            client.request("GET", f"/api/projects/{pid}/export/{kind}", account["token"])
+            done[0] += 1
+            i += 1
+
+    workers = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    def finish():
+        stop.set()
+        for worker in workers:
+            worker.join()
+        return done[0]
+
+    return finish
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_endpoint(client, scenario, count, concurrency):
+    def one(i):
+        method, path, token, payload = scenario(i)
+        return client.request(method, path, token, payload)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(r[2] * 1000 for r in results)
+    queries = [r[3] for r in results if r[3] is not None]
+    errors = [r[0] for r in results if r[0] >= 400]
+    return {
+        "requests": count,
+        "errors": len(errors),
+        "status_codes": sorted(set(r[0] for r in results)),
+        "throughput_rps": round(count / wall, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+        },
+        "queries_per_request": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nvs {baseline_path} ({baseline.get('commit')}):")
+    print(f"{'endpoint':<16}{'p50 ms':>16}{'p95 ms':>16}{'rps':>16}{'queries':>14}")
+    for name, cur in results["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if not old:
+            continue
+
+        def fmt(a, b):
+            if a is None or b is None:
+                return "-"
+            return f"{b:g} → {a:g}"
+
+        print(
+            f"{name:<16}"
+            f"{fmt(cur['latency_ms']['p50'], old['latency_ms']['p50']):>16}"
+            f"{fmt(cur['latency_ms']['p95'], old['latency_ms']['p95']):>16}"
+            f"{fmt(cur['throughput_rps'], old['throughput_rps']):>16}"
+            f"{fmt(cur['queries_per_request']['mean'], old['queries_per_request']['mean']):>14}"
+        )
+
+
+def main():
+    args = parse_args()
+    db_url = configure_env(args)
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    from app import create_app, start_services
+    from app.schema import upgrade_database
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+    start_services(app)
+    install_query_counter(app)
+    accounts = seed(app, args)
+
+    server = make_server(
+        "127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = Client(f"http://127.0.0.1:{server.server_port}")
+
+    for account in accounts:
+        status, body, _, _ = client.request("POST", "/auth/login", payload={
+            "email": account["email"], "password": account["password"],
+        })
+        account["token"] = json.loads(body)["access_token"]
+
+    scenarios = build_scenarios(accounts)
+    names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "database": db_url.split("://", 1)[0],
+        "config": {
+            k: getattr(args, k)
+            for k in ("users", "projects_per_user", "sections", "comments_per_section",
+                      "concurrency", "requests", "fake_latency_ms", "run_jobs",
+                      "background_exports", "export_mode")
+        },
+        "endpoints": {},
+    }
+
+    finish_background = None
+    if args.background_exports:
+        finish_background = start_background_exports(client, accounts, args.background_exports)
+
+    print(f"{'endpoint':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'queries':>9}{'errors':>8}")
+    for name in names:
+        stats = run_endpoint(client, scenarios[name], args.requests, args.concurrency)
+        results["endpoints"][name] = stats
+        lat = stats["latency_ms"]
+        print(
+            f"{name:<16}{lat['p50']:>9}{lat['p95']:>9}{lat['p99']:>9}"
+            f"{stats['throughput_rps']:>9}{stats['queries_per_request']['mean'] or '-':>9}"
+            f"{stats['errors']:>8}"
+        )
+
+    if finish_background:
+        results["background_exports_completed"] = finish_background()
+        print(f"\nBackground exports completed: {results['background_exports_completed']}")
+
+    server.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""gunicorn settings; the Procfile starts ``gunicorn -c gunicorn.conf.py run:app``.
+
+Generate and refine requests spend most of their time waiting on the model
+API. With the default gevent worker class each worker serves up to
+GUNICORN_WORKER_CONNECTIONS requests at once, switching between them while
+they wait on sockets, instead of one request per process. Set
+GUNICORN_WORKER_CLASS=sync to go back to one request per worker.
+"""
+import os
+
+bind = "0.0.0.0:" + os.getenv("PORT", "8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gevent")
+if worker_class == "gevent":
+    # Renders are CPU-bound and would stall every request on a gevent
+    # worker; run single exports in the render pool unless told otherwise
+    os.environ.setdefault("EXPORT_EXECUTION_MODE", "process")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+# Streaming generation can keep a response open for minutes
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    # Job threads and the render pool belong to serving workers only, not to
+    # the release step or other one-shot commands that import run:app
+    from app import start_services
+    start_services(worker.wsgi)
+
+
+def post_fork(server, worker):
+    if server.cfg.worker_class_str != "gevent":
+        return
+    # gunicorn monkey-patches the standard library for gevent workers, but
+    # psycopg2 is a C extension; without this every Postgres query blocks
+    # the whole worker instead of just its own request.
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        return  # not using Postgres
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen not installed; Postgres queries will block gevent workers")
+        return
+    patch_psycopg()
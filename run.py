@@ -1,7 +1,33 @@
-from app import create_app
+import os
+import sys
+
+from app import create_app, start_services
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
-#hello testing 
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        # Standalone generation worker (JOB_EXECUTION_MODE=worker)
+        from app.job_service import run_worker
+        run_worker(app)
+    elif len(sys.argv) > 1 and sys.argv[1] == "upgrade-db":
+        # Release step: create tables and apply schema upgrades, once per deploy
+        from app.schema import upgrade_database
+        with app.app_context():
+            upgrade_database()
+    elif len(sys.argv) > 1 and sys.argv[1] == "compact-revisions":
+        # One-off: convert full-text revision rows to snapshots + deltas
+        from app.revision_service import compact_revisions
+        with app.app_context():
+            compact_revisions()
+    else:
+        # Local development server. The reloader runs this in a watcher
+        # process too; that one upgrades the database, and only the child
+        # that serves requests starts the job threads.
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_services(app)
+        else:
+            from app.schema import upgrade_database
+            with app.app_context():
+                upgrade_database()
+        app.run(debug=True)
@@ -0,0 +1,27 @@
+import importlib
+import os
+import tempfile
+
+import pytest
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv(
+        "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+    )
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_LATENCY_MS", "0")
+    monkeypatch.setenv("FAKE_LLM_LATENCY_JITTER_MS", "0")
+    monkeypatch.setenv("JOB_EXECUTION_MODE", "worker")
+    monkeypatch.setenv("EXPORT_EXECUTION_MODE", "inline")
+    monkeypatch.setenv("RENDER_POOL_PROCESSES", "0")
+
+    from app import config, create_app
+    from app.schema import upgrade_database
+
+    importlib.reload(config)  # Config reads the environment at import time
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+    return app
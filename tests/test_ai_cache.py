@@ -0,0 +1,24 @@
+def test_db_rows_are_trimmed_every_n_writes(app):
+    from app import ai_cache
+    from app.models import AIResponseCache
+
+    app.config.update(AI_CACHE_EVICT_EVERY=5, AI_CACHE_DB_MAX_ROWS=2)
+    ai_cache._puts = 0
+
+    with app.app_context():
+        for i in range(4):
+            ai_cache.put(f"key-{i}", "model", f"response {i}")
+        assert AIResponseCache.query.count() == 4  # no trimming between runs
+
+        ai_cache.put("key-4", "model", "response 4")
+        rows = AIResponseCache.query.order_by(AIResponseCache.id).all()
+        assert [row.key for row in rows] == ["key-3", "key-4"]
+
+
+def test_cache_stats_are_only_served_as_metrics(app):
+    client = app.test_client()
+    assert client.get("/api/ai/cache").status_code == 404
+
+    app.config["METRICS_TOKEN"] = "t"
+    body = client.get("/metrics", headers={"Authorization": "Bearer t"}).get_data(as_text=True)
+    assert 'smartdoc_cache_entries{cache="ai"}' in body
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+
+def _events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def project(app):
+    client = app.test_client()
+    client.post("/auth/register", json={"email": "s@example.com", "password": "pw"})
+    token = client.post(
+        "/auth/login", json={"email": "s@example.com", "password": "pw"}
+    ).get_json()["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+    pid = client.post(
+        "/api/projects",
+        json={"title": "Streams", "doc_type": "docx", "main_topic": "t"},
+        headers=headers,
+    ).get_json()["id"]
+    client.post(
+        f"/api/projects/{pid}/sections",
+        json={"sections": [{"index": 1, "title": "Kept"}, {"index": 2, "title": "Dropped"}]},
+        headers=headers,
+    )
+    sections = client.get(f"/api/projects/{pid}", headers=headers).get_json()["sections"]
+    return client, headers, pid, [s["id"] for s in sections]
+
+
+def test_stream_errors_do_not_leak_details(project, monkeypatch):
+    from app import ai_routes
+
+    client, headers, pid, section_ids = project
+
+    def failing_stream(project_data, section, use_cache=True):
+        raise RuntimeError("GOOGLE_API_KEY is not set")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(ai_routes, "stream_section_content", failing_stream)
+    resp = client.post(f"/api/projects/{pid}/generate/stream", json={}, headers=headers)
+
+    errors = [data["error"] for name, data in _events(resp.get_data(as_text=True))
+              if name == "section_error"]
+    assert len(errors) == len(section_ids)
+    assert not any("GOOGLE_API_KEY" in error for error in errors)
+
+
+def test_stream_skips_section_removed_mid_generation(app, project, monkeypatch):
+    from app import ai_routes, db
+    from app.models import ProjectSection
+
+    client, headers, pid, (kept_id, dropped_id) = project
+
+    def stream(project_data, section, use_cache=True):
+        if section.id == dropped_id:
+            # The outline is saved without this section while it streams
+            ProjectSection.query.filter_by(id=dropped_id).delete()
+            db.session.commit()
+        yield f"Text for {section.title}"
+
+    monkeypatch.setattr(ai_routes, "stream_section_content", stream)
+    resp = client.post(f"/api/projects/{pid}/generate/stream", json={}, headers=headers)
+
+    events = _events(resp.get_data(as_text=True))
+    done = {data["section_id"] for name, data in events if name == "section_done"}
+    errors = {data["section_id"] for name, data in events if name == "section_error"}
+    assert done == {kept_id}
+    assert errors == {dropped_id}
+    assert events[-1][0] == "done"
@@ -0,0 +1,66 @@
+import threading
+
+from sqlalchemy import event
+
+
+def _login(client):
+    client.post("/auth/register", json={"email": "f@example.com", "password": "pw"})
+    token = client.post(
+        "/auth/login", json={"email": "f@example.com", "password": "pw"}
+    ).get_json()["access_token"]
+    return {"Authorization": "Bearer " + token}
+
+
+def test_project_comments_query_count_does_not_grow(app):
+    from app import db
+
+    client = app.test_client()
+    headers = _login(client)
+    with app.app_context():
+        engine = db.engine
+
+    recording = threading.Event()
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if recording.is_set():
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+
+    counts = {}
+    for n_sections in (1, 10, 40):
+        pid = client.post(
+            "/api/projects",
+            json={"title": f"p{n_sections}", "doc_type": "docx", "main_topic": "t"},
+            headers=headers,
+        ).get_json()["id"]
+        client.post(
+            f"/api/projects/{pid}/sections",
+            json={"sections": [{"index": i, "title": f"S{i}"} for i in range(1, n_sections + 1)]},
+            headers=headers,
+        )
+        section_ids = [
+            s["id"] for s in client.get(f"/api/projects/{pid}", headers=headers).get_json()["sections"]
+        ]
+        for sid in section_ids:
+            client.post(f"/api/sections/{sid}/comments", json={"comment": "a"}, headers=headers)
+            client.post(f"/api/sections/{sid}/comments", json={"comment": "b"}, headers=headers)
+            client.post(f"/api/sections/{sid}/feedback", json={"is_like": True}, headers=headers)
+            client.post(f"/api/sections/{sid}/feedback", json={"is_like": True}, headers=headers)
+            client.post(f"/api/sections/{sid}/feedback", json={"is_like": False}, headers=headers)
+
+        del statements[:]
+        recording.set()
+        resp = client.get(f"/api/projects/{pid}/comments", headers=headers)
+        recording.clear()
+        counts[n_sections] = len(statements)
+
+        items = resp.get_json()["items"]
+        assert [item["section_id"] for item in items] == section_ids
+        for item in items:
+            assert [c["comment"] for c in item["comments"]] == ["a", "b"]
+            assert (item["likes"], item["dislikes"]) == (2, 1)
+
+    event.remove(engine, "before_cursor_execute", _count)
+    assert counts[1] == counts[10] == counts[40], counts
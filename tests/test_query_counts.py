@@ -0,0 +1,171 @@
+"""Query-count and query-plan checks for every API endpoint.
+
+Each endpoint is called for a 1-section and a LARGE-section project of the
+same user. The test fails when the number of SQL statements grows with the
+number of sections, or, on SQLite, when any statement it ran plans a full
+table scan (``EXPLAIN QUERY PLAN`` reports ``SCAN <table>`` without an
+index).
+"""
+import re
+import threading
+
+import pytest
+from sqlalchemy import event
+
+LARGE = 30
+
+
+def _rename_outline(ctx):
+    return {"sections": [
+        {"id": sid, "index": i, "title": f"Renamed {i}"}
+        for i, sid in enumerate(ctx["section_ids"], start=1)
+    ]}
+
+
+# name, method, path template, JSON body (or a function of the seeded
+# project), statements allowed per extra section. Only the streamed
+# generation may grow: it saves each section as its own stream completes.
+CHECKS = [
+    ("list_projects", "GET", "/api/projects", None, 0),
+    ("get_project", "GET", "/api/projects/{pid}", None, 0),
+    ("configure_sections", "POST", "/api/projects/{pid}/sections", _rename_outline, 0),
+    ("add_comment", "POST", "/api/sections/{sid}/comments", {"comment": "check"}, 0),
+    ("add_feedback", "POST", "/api/sections/{sid}/feedback", {"is_like": True}, 0),
+    ("get_comments", "GET", "/api/projects/{pid}/comments", None, 0),
+    ("refine", "POST", "/api/sections/{sid}/refine", {"prompt": "shorter", "use_cache": False}, 0),
+    ("refine_stream", "POST", "/api/sections/{sid}/refine/stream",
+     {"prompt": "shorter", "use_cache": False}, 0),
+    ("list_revisions", "GET", "/api/sections/{sid}/revisions", None, 0),
+    ("get_revision", "GET", "/api/sections/{sid}/revisions/1", None, 0),
+    ("generate", "POST", "/api/projects/{pid}/generate", {"use_cache": False}, 0),
+    ("generate_stream", "POST", "/api/projects/{pid}/generate/stream", {"use_cache": False}, 5),
+    ("get_job", "GET", "/api/jobs/{jid}", None, 0),
+    ("export_docx", "GET", "/api/projects/{pid}/export/docx", None, 0),
+    ("export_pptx", "GET", "/api/projects/{pid}/export/pptx", None, 0),
+    ("export_bulk", "POST", "/api/export/bulk", lambda ctx: {"project_ids": [ctx["pid"]]}, 0),
+]
+
+# "SCAN projects" (SQLite >= 3.36) or "SCAN TABLE projects" (older);
+# index scans read "SCAN t USING INDEX ..." and are fine.
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+
+
+def _seed_project(client, headers, title, n_sections):
+    from app import db
+    from app.job_service import create_generation_job
+    from app.models import Project, ProjectSection, SectionComment, SectionFeedback
+    from app.revision_service import record_revisions
+
+    pid = client.post(
+        "/api/projects",
+        json={"title": title, "doc_type": "docx", "main_topic": "query counts"},
+        headers=headers,
+    ).get_json()["id"]
+    client.post(
+        f"/api/projects/{pid}/sections",
+        json={"sections": [{"index": i, "title": f"S{i}"} for i in range(1, n_sections + 1)]},
+        headers=headers,
+    )
+
+    sections = ProjectSection.query.filter_by(project_id=pid).order_by(ProjectSection.index).all()
+    record_revisions([(sec, f"Content for {sec.title}", None) for sec in sections])
+    for sec in sections:
+        db.session.add(SectionComment(section_id=sec.id, comment="first"))
+        db.session.add(SectionComment(section_id=sec.id, comment="second"))
+        db.session.add(SectionFeedback(section_id=sec.id, is_like=True))
+        db.session.add(SectionFeedback(section_id=sec.id, is_like=False))
+    # A finished job to read back; an active one would block the outline
+    # and streamed generation
+    job = create_generation_job(db.session.get(Project, pid), sections)
+    job.status = "completed"
+    db.session.commit()
+    return {
+        "pid": pid,
+        "sid": sections[0].id,
+        "jid": job.id,
+        "section_ids": [sec.id for sec in sections],
+    }
+
+
+def _full_scans(engine, statements):
+    """Tables that any of ``statements`` reads without using an index."""
+    scans = set()
+    with engine.connect() as conn:
+        for statement, parameters, executemany in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            if executemany:
+                parameters = parameters[0]
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            for row in plan:
+                match = _FULL_SCAN.match(row[-1])
+                if match:
+                    scans.add(match.group(1))
+    return scans
+
+
+@pytest.fixture
+def seeded(app):
+    from app import db
+
+    client = app.test_client()
+    client.post("/auth/register", json={"email": "q@example.com", "password": "pw"})
+    token = client.post(
+        "/auth/login", json={"email": "q@example.com", "password": "pw"}
+    ).get_json()["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+
+    with app.app_context():
+        engine = db.engine
+        small = _seed_project(client, headers, "small", 1)
+        large = _seed_project(client, headers, "large", LARGE)
+    return client, headers, engine, small, large
+
+
+@pytest.fixture
+def recorder(seeded):
+    """Statements run while ``recorder.on`` is set, from any thread.
+
+    Streamed generation saves sections from its worker threads.
+    """
+    engine = seeded[2]
+    recording = threading.Event()
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if recording.is_set():
+            statements.append((statement, parameters, executemany))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    yield recording, statements
+    event.remove(engine, "before_cursor_execute", _record)
+
+
+@pytest.mark.parametrize(
+    "method, path, body, per_section",
+    [check[1:] for check in CHECKS],
+    ids=[check[0] for check in CHECKS],
+)
+def test_query_count_and_plan(seeded, recorder, method, path, body, per_section):
+    client, headers, engine, small, large = seeded
+    recording, statements = recorder
+
+    counts = []
+    for ctx in (small, large):
+        del statements[:]
+        recording.set()
+        resp = client.open(
+            path.format(**ctx),
+            method=method,
+            json=body(ctx) if callable(body) else body,
+            headers=headers,
+        )
+        resp.get_data()  # streamed responses query while the body is read
+        recording.clear()
+        assert resp.status_code < 400, resp.get_data(as_text=True)
+        counts.append(len(statements))
+
+        if engine.dialect.name == "sqlite":
+            assert not _full_scans(engine, statements)
+
+    assert counts[1] <= counts[0] + per_section * (LARGE - 1), counts
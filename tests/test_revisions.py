@@ -0,0 +1,43 @@
+def test_interleaved_refines_keep_history_consistent(app):
+    from app import db
+    from app.models import Project, ProjectSection, User
+    from app.revision_service import reconstruct_versions, record_revision
+
+    # Long enough that version 3 is stored as a delta, not a snapshot
+    v1 = " ".join(f"alpha{i}" for i in range(200))
+    v2 = " ".join(f"one{i}" for i in range(200))
+    v3 = v1 + " epsilon"
+
+    with app.app_context():
+        user = User(email="r@example.com", password_hash="x")
+        db.session.add(user)
+        db.session.flush()
+        project = Project(user_id=user.id, title="T", doc_type="docx", main_topic="m")
+        db.session.add(project)
+        db.session.flush()
+        section = ProjectSection(project_id=project.id, index=1, title="S")
+        db.session.add(section)
+        db.session.flush()
+        record_revision(section, v1)
+        db.session.commit()
+        section_id = section.id
+
+    with app.app_context():
+        # Refine B loads v1, then ends its read transaction for the model
+        # call, keeping the loaded row (as ai_routes._release_connection does)
+        stale = db.session.get(ProjectSection, section_id)
+        session = db.session()
+        session.expire_on_commit = False
+        session.commit()
+
+        # Refine A finishes first
+        with app.app_context():
+            fresh = db.session.get(ProjectSection, section_id)
+            assert record_revision(fresh, v2) == 2
+            db.session.commit()
+
+        assert record_revision(stale, v3) == 3
+        db.session.commit()
+
+    with app.app_context():
+        assert reconstruct_versions(section_id, 1, 3) == {1: v1, 2: v2, 3: v3}